@@ -1,6 +1,6 @@
 """Application configuration from environment variables."""
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -30,6 +30,11 @@ class Settings(BaseSettings):
     MODEL_DIR: str = "./models"
     YOLO_MODEL_PATH: str = "yolov8n"
     CSRNET_MODEL_PATH: str = "csrnet_v1.pt"
+    MODEL_POOL_MAX_IDLE: int = 2  # Unused models kept loaded (LRU) for quick reuse
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 = ONNX Runtime default (all cores)
+    ONNX_INTER_OP_THREADS: int = 1
+    QUANT_CALIBRATION_CLIP: Optional[str] = None  # Sample video for int8 calibration
+    QUANT_CALIBRATION_FRAMES: int = 32
 
     # Auth
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -43,7 +48,26 @@ class Settings(BaseSettings):
     HYBRID_THRESHOLD_LOW: float = 120.0
     HYBRID_THRESHOLD_HIGH: float = 180.0
     DEFAULT_EMA_ALPHA: float = 0.7
+    INFERENCE_BACKEND: str = "thread"  # "thread" | "process"
+    INFERENCE_WORKERS: int = 4  # Threads (at least INFERENCE_MAX_BATCH_SIZE when batching), or worker processes for "process" backend
+    INFERENCE_BATCHING: bool = False  # Batch frames across streams (thread backend only)
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_BATCH_WAIT_MS: float = 15.0  # Max time a frame waits for its batch to fill
+    INGEST_DECODE_THREADS: int = 0  # FFmpeg decoder threads per "pyav" stream (0 = auto)
+    MAX_FRAME_AGE_MS: float = 0.0  # Skip frames older than this since capture before inference (0 = never)
 
+    # Live WebSocket
+    LIVE_SEND_QUEUE_SIZE: int = 32  # Messages a client may fall behind before it is disconnected
+    LIVE_TRANSPORT: str = "pubsub"  # "pubsub" | "streams" (Redis Streams: replay with ?last_id=, consumer group per API process)
+    LIVE_STREAM_MAXLEN: int = 1000  # Live events kept per stream with the "streams" transport (approximate)
+
+    # State writes
+    STATE_FLUSH_INTERVAL_MS: float = 50.0  # Per-frame Redis writes of all streams go out in one pipeline this often
+    STATE_STATS_RATE_HZ: float = 2.0  # Max rate a stream's stored stats snapshot is rewritten
+
+    # Stream listing
+    STREAM_LIST_CACHE_MS: float = 500.0  # GET /streams serves a snapshot this old at most (0 = no cache)
+    
     # Rate limiting
     RATE_LIMIT_PER_SECOND: int = 20
 
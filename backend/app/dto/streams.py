@@ -1,5 +1,5 @@
 """DTOs for stream management."""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -9,6 +9,21 @@ class StreamSource(BaseModel):
     kind: Literal["rtsp", "file", "webcam"] = Field(..., description="Source type")
     url: Optional[str] = Field(None, description="URL for RTSP/file, None for webcam")
     device_index: Optional[int] = Field(None, description="Webcam device index (0, 1, ...)")
+    target_fps: Optional[float] = Field(
+        None, gt=0, description=(
+            "Frames per second to process; RTSP skips the others before converting them, "
+            "files sample video time by seeking (None = all)"
+        )
+    )
+    offline: bool = Field(
+        False, description="Files: process as fast as possible instead of at the video's frame rate"
+    )
+    working_size: Optional[int] = Field(
+        None, ge=64, description="Scale frames at ingestion so the long side is at most this many pixels (None = source resolution)"
+    )
+    decoder: Literal["opencv", "pyav"] = Field(
+        "opencv", description="RTSP decoder: OpenCV (BGR frames) or PyAV (threaded FFmpeg decode, YUV frames converted on demand)"
+    )
 
 
 class DetectorConfig(BaseModel):
@@ -16,19 +31,37 @@ class DetectorConfig(BaseModel):
     model: str = Field("yolov8n", description="Model name: yolov8n, yolov8s, etc.")
     conf: float = Field(0.25, ge=0.0, le=1.0, description="Confidence threshold")
     imgsz: int = Field(960, description="Input image size (long side)")
+    precision: Literal["fp32", "bf16", "int8"] = Field(
+        "fp32", description="Numeric precision (int8 requires the onnx runtime)"
+    )
 
 
 class DensityConfig(BaseModel):
     """CSRNet density model configuration."""
     model: str = Field("csrnet_v1", description="Model name/version")
     input_size: int = Field(768, description="Input size (long side)")
+    precision: Literal["fp32", "bf16", "int8"] = Field(
+        "fp32", description="Numeric precision (int8 is calibrated on QUANT_CALIBRATION_CLIP)"
+    )
 
 
 class InferenceConfig(BaseModel):
     """Inference pipeline configuration."""
     mode: Literal["detector", "density", "hybrid"] = Field("hybrid", description="Inference mode")
+    runtime: Literal["torch", "onnx"] = Field("torch", description="Model runtime (onnx needs exported models)")
     detector: Optional[DetectorConfig] = None
     density: Optional[DensityConfig] = None
+    
+    @model_validator(mode="after")
+    def check_precisions(self) -> "InferenceConfig":
+        """Reject precisions the chosen runtime can't run, instead of failing when models load."""
+        if self.detector and self.detector.precision == "int8" and self.runtime != "onnx":
+            raise ValueError("detector precision int8 requires runtime 'onnx'")
+        if self.runtime == "onnx":
+            for name, model in (("detector", self.detector), ("density", self.density)):
+                if model and model.precision == "bf16":
+                    raise ValueError(f"{name} precision bf16 is not supported by runtime 'onnx'")
+        return self
 
 
 class ZonePoint(BaseModel):
@@ -82,7 +115,7 @@ class StreamStats(BaseModel):
 class StreamResponse(BaseModel):
     """Stream creation response."""
     id: str
-    status: str = Field(..., description="Stream status: starting, running, stopped, error")
+    status: str = Field(..., description="Stream status: starting, running, completed (file finished), stopped, error")
     name: Optional[str] = Field(None, description="Stream name")
     count: Optional[int] = Field(None, description="Current count")
     fps: Optional[float] = Field(None, description="Current FPS")
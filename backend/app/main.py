@@ -7,6 +7,9 @@ import logging
 from app.config import settings
 from app.routes import streams, infer, zones, auth, models, metrics
 from app.ws import live
+from app.services.stream_service import shutdown_executor
+from core.state.redis_state import close_async_redis
+from core.state.writer import state_writer
 from core.utils.logger import setup_logging, get_logger
 
 # Setup logging
@@ -23,10 +26,17 @@ async def lifespan(app: FastAPI):
     app_logger.info(f"Version: 0.1.0")
     app_logger.info(f"Debug mode: {settings.DEBUG}")
     app_logger.info(f"Redis URL: {settings.REDIS_URL}")
+    app_logger.info(f"Inference backend: {settings.INFERENCE_BACKEND} ({settings.INFERENCE_WORKERS} workers)")
     app_logger.info("=" * 60)
+    await state_writer.start()
+    await live.subscriber.start()
     yield
     # Shutdown
     app_logger.info("Shutting down Crowd Density API...")
+    await live.subscriber.stop()
+    await state_writer.stop()
+    await close_async_redis()
+    shutdown_executor()
 
 
 def create_app() -> FastAPI:
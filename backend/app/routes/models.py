@@ -1,12 +1,18 @@
 """Model management routes."""
 from fastapi import APIRouter
 
+from app.services.stream_service import current_executor
+
 router = APIRouter()
 
 
 @router.get("")
 async def list_models():
-    """List available models."""
-    # TODO: Implement model registry
-    return {"models": []}
-
+    """List loaded models with their users, memory footprint and load time."""
+    # Don't start the executor (and its worker processes) just to report nothing
+    executor = current_executor()
+    models = await executor.list_models() if executor else []
+    return {
+        "models": models,
+        "total_memory_bytes": sum(m["memory_bytes"] for m in models),
+    }
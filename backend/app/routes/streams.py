@@ -1,6 +1,7 @@
 """Stream management routes."""
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from typing import List, Optional, Tuple
+import time
 import uuid
 from datetime import datetime
 import logging
@@ -17,6 +18,15 @@ logger = get_logger(__name__)
 # In-memory store for stream configs (replace with DB later)
 _streams_db: dict[str, dict] = {}
 
+# Last GET /streams response and when it was built (monotonic seconds)
+_list_cache: Optional[Tuple[float, StreamListResponse]] = None
+
+
+def _invalidate_list_cache():
+    """Drop the cached stream listing after streams are added or removed."""
+    global _list_cache
+    _list_cache = None
+
 
 @router.post("", response_model=StreamResponse, status_code=201)
 async def create_stream(stream_data: StreamCreate):
@@ -36,6 +46,7 @@ async def create_stream(stream_data: StreamCreate):
             "output": stream_data.output.dict() if stream_data.output else {},
             "status": "starting",
         }
+        _invalidate_list_cache()
         
         logger.info(f"Stream {stream_id} created successfully")
         return StreamResponse(
@@ -90,13 +101,24 @@ async def get_stream_stats(stream_id: str):
 
 @router.get("", response_model=StreamListResponse)
 async def list_streams():
-    """List all streams."""
+    """
+    List all streams.
+    
+    Status and stats of all streams are read in one Redis round trip, and
+    the response is reused for STREAM_LIST_CACHE_MS since dashboards poll it.
+    """
+    global _list_cache
     logger.debug("GET /streams - Listing all streams")
+    now = time.monotonic()
+    if _list_cache and now - _list_cache[0] < settings.STREAM_LIST_CACHE_MS / 1000:
+        return _list_cache[1]
+    
+    # Get real status and stats from Redis
+    states = StreamState.get_many(list(_streams_db))
     streams = []
     for stream_id, stream in _streams_db.items():
-        # Get real status and stats from Redis
-        status = StreamState.get_status(stream_id) or stream.get("status", "unknown")
-        stats = StreamState.get_stats(stream_id)
+        status = states[stream_id]["status"] or stream.get("status", "unknown")
+        stats = states[stream_id]["stats"]
         
         # Build response with all available data
         stream_response = StreamResponse(
@@ -110,7 +132,9 @@ async def list_streams():
         streams.append(stream_response)
     
     logger.debug(f"Found {len(streams)} streams")
-    return StreamListResponse(streams=streams, total=len(streams))
+    response = StreamListResponse(streams=streams, total=len(streams))
+    _list_cache = (now, response)
+    return response
 
 
 @router.delete("/{stream_id}", status_code=204)
@@ -124,6 +148,7 @@ async def delete_stream(stream_id: str):
     # Stop ingestion service
     await StreamService.stop_stream(stream_id)
     del _streams_db[stream_id]
+    _invalidate_list_cache()
     logger.info(f"Stream {stream_id} deleted successfully")
     return None
 
@@ -7,16 +7,59 @@ from app.dto.streams import StreamCreate
 from app.config import settings
 from core.ingestion.rtsp import RTSPReader
 from core.ingestion.file import FileReader
+from core.ingestion.pyav import PyAVReader
 from core.ingestion.webcam import WebcamReader
-from core.orchestrator.pipeline import InferencePipeline
-from core.models.yolo import YoloDetector
-from core.models.csrnet import CSRNetInference
-from datetime import datetime
+from core.metrics.prometheus import record_frame_age, record_ingest_frame
+from core.orchestrator.batching import BatchScheduler
+from core.orchestrator.executor import PipelineExecutor, PipelineOptions
+from core.state.broker import live_broker
 from core.state.redis_state import StreamState
+from core.state.writer import state_writer
 from core.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Process-wide inference executor (created lazily)
+_executor: Optional[PipelineExecutor] = None
+
+
+def get_executor() -> PipelineExecutor:
+    """Get the shared pipeline executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = PipelineExecutor(
+            backend=settings.INFERENCE_BACKEND,
+            max_workers=settings.INFERENCE_WORKERS,
+            options=PipelineOptions(
+                csrnet_model_path=settings.CSRNET_MODEL_PATH,
+                ema_alpha=settings.DEFAULT_EMA_ALPHA,
+                model_dir=settings.MODEL_DIR,
+                onnx_intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+                onnx_inter_op_threads=settings.ONNX_INTER_OP_THREADS,
+                calibration_clip=settings.QUANT_CALIBRATION_CLIP,
+                calibration_frames=settings.QUANT_CALIBRATION_FRAMES,
+            ),
+            scheduler=BatchScheduler(
+                max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=settings.INFERENCE_BATCH_WAIT_MS,
+            ) if settings.INFERENCE_BATCHING else None,
+            max_idle_models=settings.MODEL_POOL_MAX_IDLE,
+        )
+    return _executor
+
+
+def current_executor() -> Optional[PipelineExecutor]:
+    """The shared pipeline executor, or None if nothing has needed it yet."""
+    return _executor
+
+
+def shutdown_executor():
+    """Shut down the shared pipeline executor."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
 
 class StreamWorker:
     """Background worker for processing a stream."""
@@ -25,7 +68,7 @@ class StreamWorker:
         self.stream_id = stream_id
         self.config = config
         self.reader = None
-        self.pipeline = None
+        self.executor = get_executor()
         self.running = False
         self.task = None
     
@@ -39,17 +82,46 @@ class StreamWorker:
         try:
             # Initialize reader based on source
             source = self.config["source"]
+            working_size = source.get("working_size")
             logger.info(f"[{self.stream_id}] Initializing {source['kind']} reader...")
             
             if source["kind"] == "rtsp":
-                self.reader = RTSPReader(source["url"])
-                logger.info(f"[{self.stream_id}] RTSP URL: {source['url']}")
+                decoder = source.get("decoder", "opencv")
+                if decoder == "pyav":
+                    self.reader = PyAVReader(
+                        source["url"],
+                        target_fps=source.get("target_fps"),
+                        stream_id=self.stream_id,
+                        threads=settings.INGEST_DECODE_THREADS,
+                        working_size=working_size
+                    )
+                else:
+                    self.reader = RTSPReader(
+                        source["url"],
+                        target_fps=source.get("target_fps"),
+                        stream_id=self.stream_id,
+                        working_size=working_size
+                    )
+                logger.info(
+                    f"[{self.stream_id}] RTSP URL: {source['url']} "
+                    f"(decoder: {decoder}, target fps: {source.get('target_fps') or 'all'}, "
+                    f"working size: {working_size or 'source'})"
+                )
             elif source["kind"] == "file":
-                self.reader = FileReader(source["url"])
-                logger.info(f"[{self.stream_id}] File path: {source['url']}")
+                self.reader = FileReader(
+                    source["url"],
+                    working_size=working_size,
+                    offline=source.get("offline", False),
+                    target_fps=source.get("target_fps")
+                )
+                logger.info(
+                    f"[{self.stream_id}] File path: {source['url']} "
+                    f"({'offline' if source.get('offline') else 'real time'}, "
+                    f"sample fps: {source.get('target_fps') or 'all'})"
+                )
             elif source["kind"] == "webcam":
                 device_idx = source.get("device_index", 0)
-                self.reader = WebcamReader(device_idx)
+                self.reader = WebcamReader(device_idx, working_size=working_size)
                 logger.info(f"[{self.stream_id}] Webcam device: {device_idx}")
             else:
                 raise ValueError(f"Unknown source kind: {source['kind']}")
@@ -60,57 +132,18 @@ class StreamWorker:
             logger.error(f"[{self.stream_id}] Failed to start reader: {e}", exc_info=True)
             raise
         
-        # Initialize models
-        inference_config = self.config.get("inference", {})
-        mode = inference_config.get("mode", "hybrid")
-        logger.info(f"[{self.stream_id}] Inference mode: {mode}")
-        
-        yolo = None
-        csrnet = None
-        
-        try:
-            if mode in ["detector", "hybrid"]:
-                detector_cfg = inference_config.get("detector", {})
-                model_name = detector_cfg.get("model", "yolov8n")
-                logger.info(f"[{self.stream_id}] Loading YOLO model: {model_name}")
-                yolo = YoloDetector(
-                    model_path=model_name,
-                    conf_threshold=detector_cfg.get("conf", 0.25),
-                    img_size=detector_cfg.get("imgsz", 960)
-                )
-                logger.info(f"[{self.stream_id}] YOLO model loaded successfully")
-        except Exception as e:
-            logger.error(f"[{self.stream_id}] Failed to load YOLO model: {e}", exc_info=True)
-            if mode == "detector":
-                raise  # Fail if detector is required
-        
+        # Load models and build pipeline in the executor (off the event loop)
         try:
-            if mode in ["density", "hybrid"]:
-                density_cfg = inference_config.get("density", {})
-                logger.info(f"[{self.stream_id}] Loading CSRNet model...")
-                csrnet = CSRNetInference(
-                    model_path=settings.CSRNET_MODEL_PATH,
-                    input_size=density_cfg.get("input_size", 768)
-                )
-                logger.info(f"[{self.stream_id}] CSRNet model loaded successfully")
+            await self.executor.register(self.stream_id, self.config)
         except Exception as e:
-            logger.warning(f"[{self.stream_id}] Failed to load CSRNet model: {e}", exc_info=True)
-            if mode == "density":
-                logger.error(f"[{self.stream_id}] Density mode requires CSRNet - failing")
-                raise
-        
-        # Initialize pipeline
-        zones = self.config.get("zones", [])
-        logger.info(f"[{self.stream_id}] Initializing pipeline with {len(zones)} zones")
-        self.pipeline = InferencePipeline(
-            yolo_detector=yolo,
-            csrnet=csrnet,
-            ema_alpha=settings.DEFAULT_EMA_ALPHA,
-            zones=zones
-        )
+            logger.error(f"[{self.stream_id}] Failed to initialize pipeline: {e}", exc_info=True)
+            await self.reader.stop()
+            raise
         
         # Set status
         StreamState.set_status(self.stream_id, "running")
+        live_broker.add_producer(self.stream_id)
+        state_writer.add_stream(self.stream_id)
         logger.info(f"[{self.stream_id}] Stream worker started successfully")
         
         # Start processing loop
@@ -132,13 +165,14 @@ class StreamWorker:
                 await self.task
             except asyncio.CancelledError:
                 pass
+        await self.executor.unregister(self.stream_id)
+        state_writer.remove_stream(self.stream_id)
+        live_broker.remove_producer(self.stream_id)
         StreamState.set_status(self.stream_id, "stopped")
         logger.info(f"[{self.stream_id}] Stream worker stopped")
     
     async def _process_loop(self):
         """Main processing loop."""
-        from core.postprocess.heatmap import density_to_heatmap_image
-        
         frame_count = 0
         error_count = 0
         
@@ -154,37 +188,30 @@ class StreamWorker:
                 
                 frame_count += 1
                 
+                # Skip frames that waited too long to be worth counting
+                if settings.MAX_FRAME_AGE_MS and frame.age_ms > settings.MAX_FRAME_AGE_MS:
+                    record_ingest_frame(self.stream_id, "stale")
+                    continue
+                
                 try:
-                    # Process frame
-                    result = self.pipeline.process_frame(frame, inference_mode=mode)
-                    
-                    # Generate heatmap
-                    heatmap_data = None
-                    if result["density_map"] is not None:
-                        heatmap_data = density_to_heatmap_image(
-                            result["density_map"],
-                            colormap="JET",
-                            alpha=0.55
-                        )
-                    
-                    # Encode frame as base64 (for WebSocket)
-                    import cv2
-                    import base64
-                    frame_data = None
-                    if frame_count % 2 == 0:  # Send every other frame to reduce bandwidth
-                        # Resize frame if too large (max 1920x1080)
-                        h, w = frame.shape[:2]
-                        if w > 1920 or h > 1080:
-                            scale = min(1920 / w, 1080 / h)
-                            new_w, new_h = int(w * scale), int(h * scale)
-                            frame_resized = cv2.resize(frame, (new_w, new_h))
-                        else:
-                            frame_resized = frame
-                        
-                        # Encode frame as JPEG (smaller than PNG)
-                        _, buffer = cv2.imencode('.jpg', frame_resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                        frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                        frame_data = f"data:image/jpeg;base64,{frame_base64}"
+                    # Process frame and encode heatmap/preview in the executor.
+                    # Each image tier is only encoded while someone subscribes
+                    # to it; send frames every other frame to reduce bandwidth.
+                    tiers = state_writer.watched_tiers(self.stream_id)
+                    send_frame = frame_count % 2 == 0
+                    result = await self.executor.process(
+                        self.stream_id,
+                        frame.image,
+                        inference_mode=mode,
+                        encode_frame=send_frame and "frame" in tiers,
+                        encode_heatmap="heatmap" in tiers,
+                        encode_thumbnail=send_frame and "thumbnail" in tiers,
+                        captured_at=frame.captured_at,
+                        source_shape=frame.source_shape
+                    )
+                    heatmap_data = result["heatmap"]
+                    frame_data = result["frame"]
+                    thumbnail_data = result["thumbnail"]
                     
                     # Prepare stats
                     # Use raw count for current frame (not smoothed/cumulative)
@@ -193,8 +220,9 @@ class StreamWorker:
                         "id": self.stream_id,
                         "count": current_frame_count,  # Current frame count
                         "count_smoothed": result.get("count_smoothed", current_frame_count),  # EMA smoothed (for reference)
-                        "fps": self.pipeline.last_fps,
+                        "fps": result["fps"],
                         "latency_ms": result["latency_ms"],
+                        "frame_age_ms": result["frame_age_ms"],
                         "zones": [
                             {
                                 "id": z.id,
@@ -204,8 +232,9 @@ class StreamWorker:
                             for z in result["zones"]
                         ],
                         "model_used": result["model_used"],
-                        "updated_at": datetime.utcnow().isoformat()
                     }
+                    if isinstance(self.reader, FileReader):
+                        stats["progress"] = self.reader.progress()
                     
                     # Log every 30 frames (about once per second at 30 FPS)
                     if frame_count % 30 == 0:
@@ -215,18 +244,15 @@ class StreamWorker:
                             f"latency={stats['latency_ms']:.1f}ms, model={stats['model_used']}"
                         )
                     
-                    # Update Redis state
-                    StreamState.update_stats(self.stream_id, stats)
+                    record_frame_age(self.stream_id, result["frame_age_ms"])
                     
-                    # Publish to Redis pub/sub with heatmap and frame (WebSocket will pick it up)
-                    StreamState.publish_update(self.stream_id, stats, heatmap_data, frame_data)
+                    # Store stats and publish live updates: local WebSockets get them
+                    # in-process, the state writer batches the Redis writes
+                    state_writer.submit(self.stream_id, stats, heatmap_data, frame_data, thumbnail_data)
                     
                     # Reset error count on success
                     error_count = 0
                     
-                    # Small delay to control FPS
-                    await asyncio.sleep(0.033)  # ~30 FPS max
-                    
                 except Exception as e:
                     error_count += 1
                     logger.error(
@@ -253,6 +279,15 @@ class StreamWorker:
                 f"[{self.stream_id}] Processing loop ended. "
                 f"Processed {frame_count} frames, {error_count} errors"
             )
+            if getattr(self.reader, "error", None):
+                StreamState.set_status(self.stream_id, "error")  # The reader logged why
+            elif isinstance(self.reader, FileReader) and self.reader.finished:
+                progress = self.reader.progress()
+                StreamState.set_status(self.stream_id, "completed")
+                logger.info(
+                    f"[{self.stream_id}] File finished: {progress['video_time_s']:.1f}s of video "
+                    f"in {progress['wall_time_s']:.1f}s ({progress['speed'] or 0:.2f}x real time)"
+                )
 
 
 # Global worker registry
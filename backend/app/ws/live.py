@@ -1,264 +1,727 @@
 """WebSocket live stream endpoint."""
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from uvicorn.protocols.utils import ClientDisconnected
 import json
 import asyncio
-from typing import Dict, Set
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
 from datetime import datetime
 import numpy as np
-import base64
-import cv2
-import redis
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
 
 from app.config import settings
-from core.state.redis_state import StreamState, REDIS_AVAILABLE
-from core.postprocess.heatmap import density_to_heatmap_image
+from core.state.broker import live_broker
+from core.state.redis_state import StreamState, VIEWERS_TTL_S, INSTANCE_ID, get_async_redis
+from core.state.live_message import TIERS, IMAGE_TIERS, encode_live_message, live_message_to_json, read_stats, with_stats
+from core.metrics.prometheus import record_ws_dropped, record_ws_send_lag
+from core.postprocess.heatmap import density_to_heatmap_png
 from core.utils.logger import get_logger
 
 router = APIRouter()
 logger = get_logger(__name__)
 
-# Try to connect to Redis, but make it optional
-try:
-    redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.ping()
-    logger.info("Redis connected for WebSocket pub/sub")
-except Exception as e:
-    logger.warning(f"Redis not available for WebSocket: {e}. Using fallback mode.")
-    redis_client = None
 
-# Active WebSocket connections
-_active_connections: Dict[str, Set[WebSocket]] = {}
+MESSAGE_FORMATS = ("binary", "json")
+DEFAULT_TIERS = "stats,frame,heatmap"
+
+# Consumer groups on live event streams whose consumers have all been idle
+# this long belong to API processes that are gone, and are removed
+GROUP_IDLE_TIMEOUT_S = 300.0
+GROUP_SWEEP_INTERVAL_S = 60.0
+
+
+@dataclass
+class _Outgoing:
+    """A queued live message."""
+    data: bytes
+    tier: str = "stats"
+    json_text: Optional[str] = None  # Pre-converted JSON form, if computed
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class ClientConnection:
+    """
+    One WebSocket client with its own bounded send queue and sender task.
+    
+    A slow client only delays itself. The client only receives the tiers it
+    subscribed to. When an image is queued, an older image of the same tier
+    still waiting is dropped (latest frame wins), and with max_fps images
+    arriving faster than that are skipped. Stats messages are never dropped,
+    so counts are never lost; a client that falls max_queue messages behind
+    is disconnected.
+    """
+    
+    def __init__(
+        self,
+        stream_id: str,
+        websocket: WebSocket,
+        message_format: str,
+        max_queue: int,
+        on_close,
+        tiers: FrozenSet[str] = frozenset(TIERS),
+        max_fps: float = 0.0
+    ):
+        self.stream_id = stream_id
+        self.websocket = websocket
+        self.message_format = message_format
+        self.max_queue = max_queue
+        self.tiers = tiers
+        self.max_fps = max_fps
+        self.queue: Deque[_Outgoing] = deque()
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped_images = 0
+        self._last_image_at: Dict[str, float] = {}  # tier -> time of last queued image
+        self.lag_ms = 0.0  # Queue lag of the last sent message
+        self.max_lag_ms = 0.0
+        self._on_close = on_close
+        self._ready = asyncio.Event()
+        self.task = asyncio.create_task(self._sender())
+    
+    def enqueue(self, data: bytes, tier: str = "stats", json_text: Optional[str] = None) -> bool:
+        """
+        Queue a message without waiting.
+        
+        Args:
+            data: Binary live message
+            tier: Tier the message belongs to
+            json_text: Pre-converted JSON form
+        
+        Returns:
+            False if the client is too far behind to accept it
+        """
+        now = time.monotonic()
+        if tier != "stats":
+            if self.max_fps > 0 and now - self._last_image_at.get(tier, float("-inf")) < 1.0 / self.max_fps:
+                self.dropped_images += 1
+                record_ws_dropped(self.stream_id, "rate_limited")
+                return True
+            stale = [item for item in self.queue if item.tier == tier]
+            for item in stale:
+                self.queue.remove(item)
+                self.dropped_images += 1
+                record_ws_dropped(self.stream_id)
+        if len(self.queue) >= self.max_queue:
+            return False
+        self.queue.append(_Outgoing(data, tier, json_text))
+        if tier != "stats":
+            self._last_image_at[tier] = now  # Only queued images count against max_fps
+        self._ready.set()
+        return True
+    
+    async def _sender(self):
+        """Send queued messages in order."""
+        try:
+            while True:
+                await self._ready.wait()
+                while self.queue:
+                    item = self.queue.popleft()
+                    if self.message_format == "json":
+                        await self.websocket.send_text(item.json_text or live_message_to_json(item.data))
+                    else:
+                        await self.websocket.send_bytes(item.data)
+                    self.sent += 1
+                    self.lag_ms = (time.monotonic() - item.enqueued_at) * 1000
+                    self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+                    record_ws_send_lag(self.stream_id, self.lag_ms)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError) as e:
+            logger.debug(f"Client disconnected while sending for stream {self.stream_id}: {type(e).__name__}")
+            self._on_close(self.stream_id, self.websocket)
+        except Exception as e:
+            logger.warning(f"Error sending to WebSocket for stream {self.stream_id}: {e}")
+            self._on_close(self.stream_id, self.websocket)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-connection send metrics."""
+        return {
+            "stream_id": self.stream_id,
+            "format": self.message_format,
+            "tiers": sorted(self.tiers),
+            "max_fps": self.max_fps,
+            "connected_at": self.connected_at,
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "dropped_images": self.dropped_images,
+            "lag_ms": round(self.lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+        }
 
 
 class ConnectionManager:
-    """Manage WebSocket connections."""
+    """
+    Manage WebSocket connections.
+    
+    Clients receive binary live messages (see core.state.live_message) of
+    the tiers they subscribed to, unless they connected with format=json, in
+    which case each message is converted once per broadcast to JSON with
+    base64 data URLs. Every client has its own send queue (see
+    ClientConnection), so broadcast never waits on a socket.
+    """
     
-    def __init__(self):
-        self.connections: Dict[str, Set[WebSocket]] = {}
+    def __init__(self, max_queue: int = 32):
+        self.max_queue = max_queue
+        # stream_id -> {websocket: client}
+        self.connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        self.changed = asyncio.Event()  # Set whenever a client connects or leaves
+        self._closing: Set[asyncio.Task] = set()  # Closes of dropped slow clients in flight
     
-    async def connect(self, stream_id: str, websocket: WebSocket):
-        """Connect a WebSocket client."""
+    async def connect(
+        self,
+        stream_id: str,
+        websocket: WebSocket,
+        message_format: str = "binary",
+        tiers: FrozenSet[str] = frozenset(TIERS),
+        max_fps: float = 0.0
+    ):
+        """Connect a WebSocket client subscribed to the given tiers."""
         await websocket.accept()
         if stream_id not in self.connections:
-            self.connections[stream_id] = set()
-        self.connections[stream_id].add(websocket)
+            self.connections[stream_id] = {}
+        self.connections[stream_id][websocket] = ClientConnection(
+            stream_id, websocket, message_format, self.max_queue, self.disconnect, tiers, max_fps
+        )
+        self.changed.set()
         logger.info(f"WebSocket connected for stream {stream_id} (total: {len(self.connections[stream_id])})")
     
     def disconnect(self, stream_id: str, websocket: WebSocket):
         """Disconnect a WebSocket client."""
         if stream_id in self.connections:
-            self.connections[stream_id].discard(websocket)
+            client = self.connections[stream_id].pop(websocket, None)
+            if client is None:
+                return
+            client.task.cancel()
+            self.changed.set()
             logger.info(f"WebSocket disconnected for stream {stream_id} (remaining: {len(self.connections[stream_id])})")
             if not self.connections[stream_id]:
                 del self.connections[stream_id]
                 logger.debug(f"Removed stream {stream_id} from connections")
     
-    async def broadcast(self, stream_id: str, message: dict):
-        """Broadcast message to all clients for a stream."""
-        if stream_id not in self.connections:
+    def has_viewers(self, stream_id: str, tier: Optional[str] = None) -> bool:
+        """Whether any client is connected to a stream (and subscribed to tier, if given)."""
+        clients = self.connections.get(stream_id)
+        if not clients or tier is None:
+            return bool(clients)
+        return any(tier in client.tiers for client in clients.values())
+    
+    def watched_tiers(self, stream_id: str) -> Set[str]:
+        """Tiers of a stream some client subscribes to."""
+        tiers: Set[str] = set()
+        for client in self.connections.get(stream_id, {}).values():
+            tiers |= client.tiers
+        return tiers
+    
+    def viewer_counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of clients per (stream_id, tier)."""
+        counts: Dict[Tuple[str, str], int] = {}
+        for stream_id, clients in self.connections.items():
+            for client in clients.values():
+                for tier in client.tiers:
+                    counts[(stream_id, tier)] = counts.get((stream_id, tier), 0) + 1
+        return counts
+    
+    def _drop_slow_client(self, client: ClientConnection):
+        """Disconnect a client that cannot keep up."""
+        logger.warning(
+            f"WebSocket client for stream {client.stream_id} is {len(client.queue)} messages behind, disconnecting"
+        )
+        record_ws_dropped(client.stream_id, "slow_client")
+        self.disconnect(client.stream_id, client.websocket)
+        task = asyncio.create_task(client.websocket.close(code=1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closed)
+    
+    def _closed(self, task: asyncio.Task):
+        """Forget a finished close and log how it failed, if it did."""
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Closing a slow WebSocket client failed: {task.exception()}")
+    
+    async def send(self, stream_id: str, websocket: WebSocket, message: bytes, tier: str = "stats"):
+        """Queue a binary live message for one client."""
+        client = self.connections.get(stream_id, {}).get(websocket)
+        if client is None:
+            raise ConnectionError("WebSocket is no longer connected")
+        if not client.enqueue(message, tier):
+            self._drop_slow_client(client)
+    
+    async def broadcast(self, stream_id: str, message: bytes, tier: str = "stats"):
+        """Queue a binary live message for all clients of a stream subscribed to its tier."""
+        self.deliver(stream_id, message, tier)
+    
+    def deliver(self, stream_id: str, message: bytes, tier: str = "stats"):
+        """Same as broadcast, callable from synchronous code on the event loop."""
+        clients = [c for c in self.connections.get(stream_id, {}).values() if tier in c.tiers]
+        if not clients:
             return
         
-        disconnected = set()
-        for websocket in list(self.connections[stream_id]):  # Create a copy to iterate safely
-            try:
-                await websocket.send_json(message)
-            except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError) as e:
-                # Client disconnected - remove from connections
-                disconnected.add(websocket)
-                logger.debug(f"Client disconnected during broadcast for stream {stream_id}: {type(e).__name__}")
-            except Exception as e:
-                # Other errors - log but don't remove (might be transient)
-                logger.warning(f"Error sending to WebSocket for stream {stream_id}: {e}")
-                disconnected.add(websocket)  # Remove on any error to be safe
-        
-        # Remove disconnected clients
-        for ws in disconnected:
-            self.disconnect(stream_id, ws)
+        # Convert once for all JSON clients
+        json_text = None
+        if any(c.message_format == "json" for c in clients):
+            json_text = live_message_to_json(message)
+        for client in clients:
+            if not client.enqueue(message, tier, json_text):
+                self._drop_slow_client(client)
+    
+    def connection_stats(self) -> List[Dict[str, Any]]:
+        """Send metrics of every connected client."""
+        return [client.stats() for clients in self.connections.values() for client in clients.values()]
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(max_queue=settings.LIVE_SEND_QUEUE_SIZE)
 
 
-def density_map_to_heatmap_image(density_map: np.ndarray, colormap: str = "JET", alpha: float = 0.55) -> str:
+class LiveSubscriber:
     """
-    Convert density map to base64-encoded PNG image.
+    Single Redis pub/sub subscription per process feeding all WebSockets.
     
-    Args:
-        density_map: Density map (H, W)
-        colormap: Colormap name (JET, VIRIDIS, etc.)
-        alpha: Alpha blending factor
-        
-    Returns:
-        Base64-encoded PNG image data URL
+    One pattern subscription covers every stream's live tier channels. Each
+    message is received once and its bytes are forwarded as-is to the
+    stream's clients subscribed to that tier through the ConnectionManager,
+    so the cost in Redis connections is independent of the number of viewers.
+    
+    Image tiers only publish frame_ref messages. The image itself is fetched
+    from the tier's latest key, once per process and only while the tier has
+    viewers; refs arriving during a fetch collapse into one more fetch.
+    
+    With transport="streams" updates are read instead from the capped Redis
+    Stream of each stream that has local viewers, through a consumer group
+    per API process: its read position survives Redis reconnects, so nothing
+    is lost in between. Groups are destroyed when their viewers leave and on
+    shutdown; groups of processes that died are swept once idle for
+    GROUP_IDLE_TIMEOUT_S. Stats messages then carry their entry ID as
+    "event_id", which clients pass back as ?last_id= to replay what they missed.
+    
+    Streams processed in this same process are skipped: the LiveBroker
+    already delivered them (except stats with transport="streams", which
+    are read back for their event IDs).
+    
+    It also reports this process's viewer count per stream and tier to
+    Redis, where stream workers read it to skip encoding unwatched tiers.
     """
-    # Normalize to 0-1
-    if density_map.max() > 0:
-        normalized = density_map / density_map.max()
-    else:
-        normalized = density_map
     
-    # Convert to 0-255
-    normalized = (normalized * 255).astype(np.uint8)
+    def __init__(self, connections: ConnectionManager, prefix: str, transport: str = "pubsub"):
+        self.connections = connections
+        self.prefix = prefix
+        self.transport = transport
+        self.instance_id = INSTANCE_ID
+        self.redis: Optional[aioredis.Redis] = None
+        self._tasks = []
+        self._reported: Set[Tuple[str, str]] = set()  # (stream_id, tier) fields written
+        self._fetching: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._refetch: Set[Tuple[str, str]] = set()  # Refs that arrived during a fetch
+        self._delivered: Dict[Tuple[str, str], int] = {}  # Sequence number of the last image sent
+        self._groups: Set[str] = set()  # Event streams this process has a consumer group on
+    
+    @property
+    def available(self) -> bool:
+        return self.redis is not None
+    
+    async def start(self):
+        """Connect to Redis and start the fan-out task (no-op if Redis is unavailable)."""
+        client = get_async_redis()
+        try:
+            await client.ping()
+        except Exception as e:
+            logger.warning(f"Redis not available for WebSocket: {e}. Using fallback mode.")
+            await client.aclose()
+            return
+        self.redis = client
+        run = self._run_streams if self.transport == "streams" else self._run
+        self._tasks = [asyncio.create_task(run()), asyncio.create_task(self._report_viewers())]
+        if self.transport == "streams":
+            self._tasks.append(asyncio.create_task(self._sweep_groups()))
+        logger.info(f"Redis connected for WebSocket live updates (transport: {self.transport})")
+    
+    async def stop(self):
+        """Stop the background tasks, withdraw viewer counts and close the Redis connection."""
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for task in list(self._fetching.values()):
+            task.cancel()
+        self._fetching.clear()
+        if self.redis:
+            try:
+                for stream_id, tier in self._reported:
+                    await self.redis.hdel(self._viewers_key(stream_id), self._viewers_field(tier))
+            except Exception:
+                pass
+            for key in self._groups:
+                try:
+                    await self.redis.xgroup_destroy(key, self.instance_id)
+                except Exception as e:
+                    logger.warning(f"Failed to remove consumer group from {key}: {e}")
+            self._groups.clear()
+            await self.redis.aclose()
+            self.redis = None
+    
+    def _viewers_key(self, stream_id: str) -> str:
+        return f"{self.prefix}:{stream_id}:viewers"
+    
+    def _viewers_field(self, tier: str) -> str:
+        return f"{self.instance_id}:{tier}"
+    
+    async def _report_viewers(self):
+        """Publish viewer counts per tier on every change, and refresh them before they expire."""
+        while True:
+            self.connections.changed.clear()
+            try:
+                counts = self.connections.viewer_counts()
+                pipe = self.redis.pipeline(transaction=False)
+                for (stream_id, tier), count in counts.items():
+                    pipe.hset(self._viewers_key(stream_id), self._viewers_field(tier), count)
+                for stream_id in {stream_id for stream_id, _ in counts}:
+                    pipe.expire(self._viewers_key(stream_id), VIEWERS_TTL_S)
+                for stream_id, tier in self._reported - counts.keys():
+                    pipe.hdel(self._viewers_key(stream_id), self._viewers_field(tier))
+                await pipe.execute()
+                self._reported = set(counts)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to report viewer counts: {e}")
+            
+            try:
+                await asyncio.wait_for(self.connections.changed.wait(), VIEWERS_TTL_S / 3)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _parse_channel(self, channel: str) -> Tuple[str, str]:
+        """Extract (stream_id, tier) from '<prefix>:<stream_id>:live[:<tier>]'."""
+        name = channel[len(self.prefix) + 1:]
+        if name.endswith(":live"):
+            return name[:-len(":live")], "stats"
+        name, tier = name.rsplit(":", 1)
+        return name[:-len(":live")], tier
+    
+    async def _run(self):
+        """Receive live updates and fan them out, resubscribing after Redis errors."""
+        pattern = f"{self.prefix}:*:live*"
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(pattern)
+                logger.info(f"Subscribed to Redis pattern {pattern}")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    stream_id, tier = self._parse_channel(message["channel"].decode())
+                    await self._dispatch(stream_id, tier, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis pub/sub error, resubscribing in 1s: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+    async def _dispatch(self, stream_id: str, tier: str, data: bytes):
+        """Forward stats to the tier's viewers; resolve image refs."""
+        if tier not in TIERS or not self.connections.has_viewers(stream_id, tier):
+            return
+        if live_broker.is_local(stream_id) and not (tier == "stats" and self.transport == "streams"):
+            return  # Already delivered in-process by the LiveBroker
+        if tier == "stats":
+            await self.connections.broadcast(stream_id, data, tier)
+        else:
+            self._on_frame_ref(stream_id, tier)
+    
+    async def _join_group(self, key: str):
+        """Read a stream's events from now on through this process's consumer group."""
+        try:
+            await self.redis.xgroup_create(key, self.instance_id, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            # Left over from earlier viewers: skip what was missed while nobody watched
+            await self.redis.xgroup_setid(key, self.instance_id, id="$")
+        self._groups.add(key)
+    
+    async def _run_streams(self):
+        """Read live events of watched streams through consumer groups and fan them out."""
+        while True:
+            try:
+                keys = {StreamState.events_key(stream_id): stream_id for stream_id in self.connections.connections}
+                if not keys:
+                    self.connections.changed.clear()
+                    try:
+                        await asyncio.wait_for(self.connections.changed.wait(), 1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for key in keys.keys() - self._groups:
+                    await self._join_group(key)
+                for key in self._groups - keys.keys():
+                    await self.redis.xgroup_destroy(key, self.instance_id)
+                    self._groups.discard(key)
+                
+                response = await self.redis.xreadgroup(
+                    self.instance_id, self.instance_id, {key: ">" for key in keys}, count=100, block=500
+                )
+                for key, entries in response or []:
+                    key = key.decode()
+                    for entry_id, fields in entries:
+                        tier = fields[b"tier"].decode()
+                        data = fields[b"data"]
+                        if tier == "stats":
+                            data = with_stats(data, event_id=entry_id.decode())
+                        await self._dispatch(keys[key], tier, data)
+                    await self.redis.xack(key, self.instance_id, *(entry_id for entry_id, _ in entries))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis Streams read error, retrying in 1s: {e}")
+                await asyncio.sleep(1.0)
+    
+    async def _sweep_groups(self):
+        """Periodically destroy other processes' consumer groups that nobody reads anymore."""
+        unread: Set[Tuple[bytes, str]] = set()  # Groups without consumers at the last sweep
+        while True:
+            await asyncio.sleep(GROUP_SWEEP_INTERVAL_S)
+            try:
+                removed = 0
+                still_unread = set()
+                async for key in self.redis.scan_iter(match=f"{self.prefix}:*:events", count=500):
+                    for group in await self.redis.xinfo_groups(key):
+                        name = group["name"].decode() if isinstance(group["name"], bytes) else group["name"]
+                        if name == self.instance_id:
+                            continue
+                        consumers = await self.redis.xinfo_consumers(key, name)
+                        if not consumers:
+                            # Just created and not read yet, or never read: give it one interval
+                            if (key, name) not in unread:
+                                still_unread.add((key, name))
+                                continue
+                        elif any(c["idle"] <= GROUP_IDLE_TIMEOUT_S * 1000 for c in consumers):
+                            continue
+                        await self.redis.xgroup_destroy(key, name)
+                        removed += 1
+                unread = still_unread
+                if removed:
+                    logger.info(f"Removed {removed} abandoned live consumer groups")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Consumer group sweep failed: {e}")
+    
+    async def replay(self, stream_id: str, last_id: str) -> List[bytes]:
+        """
+        Stats messages a client missed since the event it saw last.
+        
+        Args:
+            stream_id: Stream ID
+            last_id: event_id of the last stats message the client received
+        
+        Returns:
+            Binary stats messages, oldest first (only with transport="streams")
+        """
+        if not self.available or self.transport != "streams":
+            return []
+        entries = await self.redis.xrange(StreamState.events_key(stream_id), min=f"({last_id}", max="+")
+        return [
+            with_stats(fields[b"data"], event_id=entry_id.decode())
+            for entry_id, fields in entries
+            if fields[b"tier"] == b"stats"
+        ]
+    
+    def _on_frame_ref(self, stream_id: str, tier: str):
+        """Fetch the referenced image unless a fetch for the tier is already running."""
+        key = (stream_id, tier)
+        if key in self._fetching:
+            self._refetch.add(key)
+            return
+        self._fetching[key] = asyncio.create_task(self._fetch_latest(stream_id, tier))
+    
+    async def _fetch_latest(self, stream_id: str, tier: str):
+        """Forward the latest image of a tier, repeating while newer refs arrived meanwhile."""
+        key = (stream_id, tier)
+        try:
+            while True:
+                self._refetch.discard(key)
+                data = await self.redis.get(StreamState.latest_key(stream_id, tier))
+                if data is not None and self.connections.has_viewers(stream_id, tier):
+                    seq = read_stats(data).get("seq")
+                    if seq != self._delivered.get(key):
+                        self._delivered[key] = seq
+                        await self.connections.broadcast(stream_id, data, tier)
+                if key not in self._refetch:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to fetch latest {tier} image for stream {stream_id}: {e}")
+        finally:
+            self._fetching.pop(key, None)
+            if not self.connections.has_viewers(stream_id, tier):
+                self._delivered.pop(key, None)
     
-    # Apply colormap
-    colormap_code = getattr(cv2, f"COLORMAP_{colormap}", cv2.COLORMAP_JET)
-    heatmap = cv2.applyColorMap(normalized, colormap_code)
+    async def latest_images(self, stream_id: str, tiers: FrozenSet[str]) -> List[Tuple[str, bytes]]:
+        """Stored latest image messages of a stream's tiers, e.g. for a client that just connected."""
+        tiers = [tier for tier in IMAGE_TIERS if tier in tiers]
+        if not self.available or not tiers:
+            return []
+        values = await self.redis.mget([StreamState.latest_key(stream_id, tier) for tier in tiers])
+        return [(tier, data) for tier, data in zip(tiers, values) if data is not None]
+
+
+subscriber = LiveSubscriber(manager, settings.REDIS_STREAM_PREFIX, settings.LIVE_TRANSPORT)
+
+
+def _deliver_local(stream_id: str, message: bytes, tier: str):
+    """Deliver an update of a stream processed in this process."""
+    if tier == "stats" and subscriber.available and subscriber.transport == "streams":
+        return  # Read back from the Redis Stream instead, to carry its replayable event_id
+    manager.deliver(stream_id, message, tier)
+
+
+# Streams processed in this process reach their viewers without Redis
+live_broker.add_consumer(_deliver_local, manager.watched_tiers)
+
+
+@router.get("/connections")
+async def list_connections():
+    """Per-connection send queue metrics for this process."""
+    return {"connections": manager.connection_stats()}
+
+
+async def _send_initial(stream_id: str, websocket: WebSocket, tiers: FrozenSet[str], last_id: Optional[str]):
+    """Queue what a new client needs before live updates: missed or latest stats, latest images."""
+    missed = await subscriber.replay(stream_id, last_id) if last_id else []
+    # Keep room in the send queue for live updates and the latest images, or a
+    # long gap would get the client dropped as slow and reconnecting forever
+    limit = max(manager.max_queue - len(TIERS), 1)
+    if len(missed) > limit:
+        logger.debug(f"Replaying only the newest {limit} of {len(missed)} missed stats messages for stream {stream_id}")
+        missed = missed[-limit:]
+    for data in missed:
+        await manager.send(stream_id, websocket, data)
+    if missed:
+        logger.debug(f"Replayed {len(missed)} stats messages since {last_id} for stream {stream_id}")
+        tiers = tiers - {"stats"}
     
-    # Encode to PNG
-    _, buffer = cv2.imencode('.png', heatmap)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
+    if live_broker.is_local(stream_id):
+        # Latest stats and images straight from the in-process broker
+        for tier, data in live_broker.latest(stream_id, tiers):
+            await manager.send(stream_id, websocket, data, tier)
+        return
     
-    return f"data:image/png;base64,{img_base64}"
+    stats = await StreamState.get_stats_async(stream_id) if "stats" in tiers else None
+    if stats:
+        message = {
+            "type": "frame_stats",
+            "ts": datetime.utcnow().timestamp(),
+            "count": stats.get("count", 0),
+            "zones": stats.get("zones", []),
+            "fps": stats.get("fps", 0.0),
+            "model": stats.get("model_used", "hybrid"),
+            "status": "running",
+            "name": stream_id,
+        }
+        await manager.send(stream_id, websocket, encode_live_message(message))
+        logger.debug(f"Sent initial stats to WebSocket for stream {stream_id}")
+    # And the latest images, if still stored
+    for tier, data in await subscriber.latest_images(stream_id, tiers):
+        await manager.send(stream_id, websocket, data, tier)
 
 
 @router.websocket("/streams/{stream_id}/live")
-async def websocket_live(websocket: WebSocket, stream_id: str):
-    """WebSocket endpoint for live stream updates."""
-    logger.info(f"WebSocket connection request for stream {stream_id}")
-    await manager.connect(stream_id, websocket)
+async def websocket_live(
+    websocket: WebSocket,
+    stream_id: str,
+    format: str = "binary",
+    tiers: str = DEFAULT_TIERS,
+    max_fps: float = 0.0,
+    last_id: Optional[str] = None
+):
+    """
+    WebSocket endpoint for live stream updates.
+    
+    Updates are pushed by the process-wide LiveSubscriber; this handler only
+    sends the latest stats on connect and then waits for the client to leave.
+    Messages are binary (core.state.live_message) unless ?format=json.
+    
+    ?tiers= is a comma-separated subset of stats, thumbnail, frame, heatmap
+    (e.g. tiers=stats for a count-only dashboard tile) and ?max_fps= caps the
+    rate of image messages (0 = every produced image).
+    
+    With LIVE_TRANSPORT="streams", stats messages carry an "event_id";
+    reconnecting with ?last_id=<event_id> replays the stats missed since
+    (as far back as LIVE_STREAM_MAXLEN). Replayed and live messages may
+    overlap, so clients should skip event IDs they already have.
+    """
+    requested = frozenset(t.strip() for t in tiers.split(",") if t.strip())
+    logger.info(
+        f"WebSocket connection request for stream {stream_id} "
+        f"(format: {format}, tiers: {','.join(sorted(requested))}, max_fps: {max_fps})"
+    )
+    if format not in MESSAGE_FORMATS:
+        await websocket.close(code=1003, reason=f"Unknown format: {format}")
+        return
+    if not requested or not requested <= set(TIERS) or max_fps < 0:
+        await websocket.close(code=1003, reason=f"Invalid tiers or max_fps: {tiers}, {max_fps}")
+        return
+    await manager.connect(stream_id, websocket, format, requested, max_fps)
     
-    pubsub = None
     try:
-        # Subscribe to Redis pub/sub if available
-        if redis_client:
-            channel = f"{settings.REDIS_STREAM_PREFIX}:{stream_id}:live"
-            logger.debug(f"Subscribing to Redis channel: {channel}")
-            pubsub = redis_client.pubsub()
-            pubsub.subscribe(channel)
-            logger.info(f"Subscribed to Redis pub/sub for stream {stream_id}")
-        else:
-            logger.warning(f"Redis not available, using fallback mode for stream {stream_id}")
+        if not subscriber.available and not live_broker.is_local(stream_id):
+            logger.warning(f"Redis not available and stream {stream_id} is not processed here, no live updates")
         
-        # Also try to get latest stats
+        # Send missed stats, or else the latest stats right away
         try:
-            stats = StreamState.get_stats(stream_id)
-            if stats:
-                message = {
-                    "type": "frame_stats",
-                    "ts": datetime.utcnow().timestamp(),
-                    "count": stats.get("count", 0),
-                    "zones": stats.get("zones", []),
-                    "fps": stats.get("fps", 0.0),
-                    "model": stats.get("model_used", "hybrid"),
-                    "heatmap": None,
-                    "frame": None,
-                    "frame_url": None,
-                    "status": "running",
-                    "name": stream_id,
-                }
-                await websocket.send_json(message)
-                logger.debug(f"Sent initial stats to WebSocket for stream {stream_id}")
+            await _send_initial(stream_id, websocket, requested, last_id)
         except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError):
             # Client already disconnected, exit gracefully
             raise
         except Exception as e:
             logger.warning(f"Error sending initial stats for stream {stream_id}: {e}")
         
-        # Listen for updates
-        message_count = 0
         while True:
-            try:
-                if pubsub:
-                    message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                    if message:
-                        try:
-                            data = json.loads(message["data"])
-                            await websocket.send_json(data)
-                            message_count += 1
-                            if message_count % 30 == 0:
-                                logger.debug(f"Sent {message_count} messages to WebSocket for stream {stream_id}")
-                        except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError):
-                            # Client disconnected, break out of loop
-                            raise
-                        except Exception as e:
-                            # Only log if it's not a disconnection-related error
-                            if not isinstance(e, (asyncio.CancelledError, ConnectionError)):
-                                logger.debug(f"Error sending WebSocket message for stream {stream_id}: {e}")
-                else:
-                    # Fallback: send placeholder data if Redis not available
-                    try:
-                        message = {
-                            "type": "frame_stats",
-                            "ts": datetime.utcnow().timestamp(),
-                            "count": 0,
-                            "zones": [],
-                            "fps": 0.0,
-                            "model": "hybrid",
-                            "heatmap": None,
-                            "frame": None,
-                            "frame_url": None,
-                            "status": "running",
-                            "name": stream_id,
-                        }
-                        await websocket.send_json(message)
-                        await asyncio.sleep(1.0)  # Slower updates without Redis
-                    except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError):
-                        # Client disconnected, exit loop
-                        raise
-                
-                # Small delay to prevent busy loop
-                await asyncio.sleep(0.01)
-            except (WebSocketDisconnect, ClientDisconnected, ConnectionError, RuntimeError):
-                # Client disconnected, exit loop
-                raise
+            # Nothing to do but notice the disconnect; client messages are ignored
+            await websocket.receive_text()
     
     except (WebSocketDisconnect, ClientDisconnected):
         logger.info(f"WebSocket disconnected for stream {stream_id} (normal disconnect)")
-        if pubsub:
-            try:
-                pubsub.close()
-            except:
-                pass
-        manager.disconnect(stream_id, websocket)
     except ConnectionError as e:
         logger.info(f"WebSocket connection error for stream {stream_id}: {e}")
-        if pubsub:
-            try:
-                pubsub.close()
-            except:
-                pass
-        manager.disconnect(stream_id, websocket)
     except Exception as e:
         # Only log unexpected errors with full traceback
         # Skip logging for expected shutdown/disconnection errors
-        if not isinstance(e, (RuntimeError, asyncio.CancelledError, ConnectionError, WebSocketDisconnect, ClientDisconnected)):
+        if not isinstance(e, (RuntimeError, asyncio.CancelledError)):
             logger.error(f"WebSocket error for stream {stream_id}: {e}", exc_info=True)
-        elif not isinstance(e, (asyncio.CancelledError, RuntimeError)):
-            # Log connection errors at info level, not error
-            logger.debug(f"WebSocket connection error for stream {stream_id}: {type(e).__name__}")
-        if pubsub:
-            try:
-                pubsub.close()
-            except:
-                pass
+    finally:
         manager.disconnect(stream_id, websocket)
 
 
-async def publish_stream_update(stream_id: str, stats: dict, density_map: np.ndarray = None, frame_data: str = None):
+async def publish_stream_update(stream_id: str, stats: dict, density_map: np.ndarray = None, frame: bytes = None):
     """Publish stream update to WebSocket clients and Redis."""
-    message = {
-        "type": "frame_stats",
-        "ts": datetime.utcnow().timestamp(),
-        "count": stats.get("count", 0),
+    stats = {
+        **stats,
         "zones": [{"id": z["id"], "count": z["count"], "alert": z.get("alert", False)} 
                   for z in stats.get("zones", [])],
-        "fps": stats.get("fps", 0.0),
-        "model": stats.get("model_used", "unknown"),
-        "heatmap": None,
-        "frame": frame_data,
-        "frame_url": frame_data,  # Alias for frontend compatibility
     }
+    heatmap = density_to_heatmap_png(density_map) if density_map is not None else None
+    updates = StreamState.live_updates(stream_id, stats, time.time(), heatmap, frame)
     
-    # Add heatmap if provided
-    if density_map is not None:
-        message["heatmap"] = density_to_heatmap_image(density_map)
-    
-    # Publish to Redis pub/sub
-    if redis_client:
-        channel = f"{settings.REDIS_STREAM_PREFIX}:{stream_id}:live"
-        redis_client.publish(channel, json.dumps(message))
+    if not subscriber.available:
+        live_broker.publish(stream_id, updates)
+        return
     
-    # Also broadcast directly to WebSocket clients
-    await manager.broadcast(stream_id, message)
-
+    # Store images, send stats and refs; the subscriber fans them out to local clients
+    pipe = subscriber.redis.pipeline(transaction=False)
+    for update in updates:
+        StreamState.queue_live_update(pipe, stream_id, update)
+    await pipe.execute()
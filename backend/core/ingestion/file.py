@@ -1,41 +1,183 @@
 """File-based video frame reader."""
 import cv2
 import asyncio
-from typing import AsyncIterator, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import numpy as np
 
+from core.ingestion.frame import CapturedFrame, downscale
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sampling gaps longer than this (video time) seek instead of grabbing through
+# frames; shorter ones cost less than decoding forward from the last keyframe
+SEEK_MIN_GAP_S = 2.0
+
 
 class FileReader:
-    """Async file video reader."""
+    """
+    Async file video reader.
+    
+    Frames are paced to the video's own timestamps, like a live source.
+    With offline=True the file is processed as fast as the pipeline takes
+    frames; either way the next frame is decoded while the current one is
+    processed. With target_fps, frames are sampled at that rate of video
+    time: short gaps are skipped with grab(), long ones by seeking.
+    progress() reports video time against wall time.
+    """
     
-    def __init__(self, file_path: str):
+    def __init__(
+        self,
+        file_path: str,
+        working_size: Optional[int] = None,
+        offline: bool = False,
+        target_fps: Optional[float] = None
+    ):
         self.file_path = file_path
+        self.working_size = working_size
+        self.offline = offline
+        self.target_fps = target_fps
         self.cap: Optional[cv2.VideoCapture] = None
+        self._io: Optional[ThreadPoolExecutor] = None  # Serializes every call on cap
+        self.fps = 0.0
+        self.duration_s = 0.0
+        self._index = 0  # Index of the next frame cap.read() returns
+        self._next_sample_s = 0.0
+        self.position_s = 0.0  # Video time of the last frame handed out
+        self.started_at: Optional[float] = None
+        self.frames_read = 0
+        self.finished = False
     
     async def start(self):
         """Open video file."""
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        self.cap = await loop.run_in_executor(
-            None, cv2.VideoCapture, self.file_path
-        )
+        # One thread owns the capture, so reads ahead never overlap release
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-reader")
+        loop = asyncio.get_running_loop()
+        self.cap = await loop.run_in_executor(self._io, cv2.VideoCapture, self.file_path)
         if not self.cap.isOpened():
+            self.cap = None
+            self._io.shutdown(wait=False)
+            self._io = None
             raise RuntimeError(f"Failed to open video file: {self.file_path}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 0.0
+        frame_count = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        self.duration_s = frame_count / self.fps if self.fps and frame_count > 0 else 0.0
+        if self.target_fps and not self.fps:
+            logger.warning(f"Unknown frame rate for {self.file_path}; reading every frame instead of sampling")
     
     async def stop(self):
         """Close video file."""
         if self.cap:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self.cap.release)
-            self.cap = None
+            cap, self.cap = self.cap, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._io, cap.release)
+        if self._io:
+            self._io.shutdown(wait=False)
+            self._io = None
     
-    async def frames(self) -> AsyncIterator[np.ndarray]:
-        """Async iterator of frames."""
-        loop = asyncio.get_event_loop()
-        while self.cap and self.cap.isOpened():
-            ret, frame = await loop.run_in_executor(None, self.cap.read)
-            if not ret:
+    def _read_next(self) -> Optional[Tuple[np.ndarray, float, Optional[Tuple[int, int]]]]:
+        """
+        Read the next frame to hand out (runs on the reader thread).
+        
+        Returns:
+            (frame, video time in seconds, source shape if downscaled), or None at the end
+        """
+        cap = self.cap
+        if cap is None:
+            return None
+        if self.target_fps and self.fps:
+            target = max(round(self._next_sample_s * self.fps), self._index)
+            gap = target - self._index
+            if gap > SEEK_MIN_GAP_S * self.fps:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            else:
+                for _ in range(gap):
+                    if not cap.grab():
+                        return None
+            self._index = target
+            self._next_sample_s += 1.0 / self.target_fps
+        ret, frame = cap.read()
+        if not ret:
+            return None
+        position_s = self._index / self.fps if self.fps else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        self._index += 1
+        frame, source_shape = downscale(frame, self.working_size)
+        return frame, position_s, source_shape
+    
+    async def frames(self) -> AsyncIterator[CapturedFrame]:
+        """Async iterator of frames, paced to video time unless offline."""
+        loop = asyncio.get_running_loop()
+        seq = 0
+        origin = None  # Wall time of video time 0 when pacing
+        pending = loop.run_in_executor(self._io, self._read_next)
+        while True:
+            item = await pending
+            if item is None:
+                self.finished = self.cap is not None  # Reached the end rather than stopped
                 break
-            yield frame
-            await asyncio.sleep(0.033)  # ~30 FPS
+            frame, position_s, source_shape = item
+            # Decode the next frame while this one is processed
+            pending = loop.run_in_executor(self._io, self._read_next)
+            
+            now = time.monotonic()
+            if self.started_at is None:
+                self.started_at = now
+                origin = now - position_s
+            if not self.offline:
+                delay = origin + position_s - now
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    now = time.monotonic()
+            
+            self.position_s = position_s
+            self.frames_read += 1
+            seq += 1
+            yield CapturedFrame(frame, seq, now, source_shape)
+    
+    def progress(self) -> Dict[str, Any]:
+        """Video time processed against wall time spent."""
+        wall_s = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        return {
+            "video_time_s": round(self.position_s, 3),
+            "duration_s": round(self.duration_s, 3) if self.duration_s else None,
+            "percent": round(min(self.position_s / self.duration_s * 100, 100.0), 1) if self.duration_s else None,
+            "wall_time_s": round(wall_s, 3),
+            "speed": round(self.position_s / wall_s, 2) if wall_s > 0 else None,  # x real time
+            "frames": self.frames_read,
+            "finished": self.finished,
+        }
 
+
+def read_sample_frames(file_path: str, num_frames: int = 32) -> List[np.ndarray]:
+    """
+    Read frames spread evenly over a video (e.g. for quantization calibration).
+    
+    Args:
+        file_path: Video file path
+        num_frames: Number of frames to sample
+        
+    Returns:
+        List of BGR frames
+    """
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video file: {file_path}")
+    
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(total // num_frames, 1) if total > 0 else 1
+        frames = []
+        index = 0
+        while len(frames) < num_frames:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+            index += step
+        return frames
+    finally:
+        cap.release()
@@ -0,0 +1,182 @@
+"""Captured frames, planar decoder frames and the latest-frame slot shared by reader threads and the event loop."""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+# Decoder pixel formats whose first plane is 8-bit full-resolution luma
+LUMA_FORMATS = frozenset(("yuv420p", "yuvj420p", "yuv422p", "yuvj422p", "yuv444p", "yuvj444p", "nv12", "nv21", "gray"))
+
+
+def fit_size(width: int, height: int, max_side: Optional[int]) -> Tuple[int, int]:
+    """(width, height) scaled down so the long side is at most max_side (never up)."""
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+def downscale(image: np.ndarray, max_side: Optional[int]) -> Tuple[np.ndarray, Optional[Tuple[int, int]]]:
+    """
+    Shrink a BGR frame to a working resolution.
+
+    Returns:
+        (image, source (H, W) if it was shrunk, else None)
+    """
+    h, w = image.shape[:2]
+    size = fit_size(w, h, max_side)
+    if size == (w, h):
+        return image, None
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), (h, w)
+
+
+class PlanarFrame:
+    """
+    A decoded frame left in the decoder's pixel format (usually YUV 4:2:0).
+
+    luma() is a zero-copy view of the Y plane, enough for scene scoring and
+    motion checks; bgr() runs the colour conversion only when something needs
+    colour, scaled in the same swscale pass to the size that consumer uses.
+    Conversions are cached per size. shape matches a BGR array of the frame.
+    """
+
+    __slots__ = ("frame", "_bgr")
+
+    def __init__(self, frame: Any):
+        self.frame = frame  # av.VideoFrame
+        self._bgr: Dict[Tuple[int, int], np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.frame.height, self.frame.width, 3
+
+    def luma(self) -> np.ndarray:
+        """Grayscale (H, W) uint8 view of the Y plane; converted if the format has none."""
+        frame = self.frame
+        if frame.format.name not in LUMA_FORMATS:
+            return frame.reformat(format="gray").to_ndarray()
+        plane = frame.planes[0]
+        rows = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)
+        return rows[:frame.height, :frame.width]
+
+    def bgr(self, max_side: Optional[int] = None) -> np.ndarray:
+        """
+        BGR (H', W', 3) array of the frame.
+
+        Args:
+            max_side: Scale down so the long side fits (never up); None for full size
+        """
+        w, h = fit_size(self.frame.width, self.frame.height, max_side)
+        image = self._bgr.get((w, h))
+        if image is None:
+            image = self.frame.reformat(width=w, height=h, format="bgr24").to_ndarray()
+            self._bgr[(w, h)] = image
+        return image
+
+
+# What readers hand to the pipeline
+Frame = Union[np.ndarray, PlanarFrame]
+
+
+def frame_luma(image: Frame) -> np.ndarray:
+    """Grayscale version of a frame (zero-copy for planar frames)."""
+    if isinstance(image, PlanarFrame):
+        return image.luma()
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def frame_bgr(image: Frame, max_side: Optional[int] = None) -> np.ndarray:
+    """
+    BGR array of a frame for a consumer working at max_side (long side).
+
+    Planar frames are converted at that size; BGR arrays are returned as
+    they are, since the consumer resizes them anyway.
+    """
+    if isinstance(image, PlanarFrame):
+        return image.bgr(max_side)
+    return image
+
+
+class CapturedFrame(NamedTuple):
+    """A source frame and when it was captured."""
+    image: Frame
+    seq: int  # Per-reader sequence number, starting at 1
+    captured_at: float  # time.monotonic() when the frame was read from the source
+    source_shape: Optional[Tuple[int, int]] = None  # (H, W) of the source if image was scaled to a working size
+
+    @property
+    def age_ms(self) -> float:
+        """Time since capture in milliseconds."""
+        return (time.monotonic() - self.captured_at) * 1000
+
+
+class LatestFrameSlot:
+    """
+    Single-slot buffer holding only the newest frame.
+
+    A reader thread put()s frames, overwriting one the consumer has not taken
+    yet; the async consumer awaits get(), which wakes up as soon as a frame
+    arrives instead of polling. Sequence numbers reveal how many frames were
+    overwritten in between.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame: Optional[CapturedFrame] = None
+        self._seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.overwritten = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Set the event loop get() runs on (call from that loop before the producer starts)."""
+        self._loop = loop
+
+    def put(self, image: Frame, captured_at: float, source_shape: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Store a frame from the producer thread.
+
+        Args:
+            image: Decoded frame
+            captured_at: time.monotonic() when it was captured
+            source_shape: Source (H, W) if image was scaled to a working size
+
+        Returns:
+            True if it overwrote a frame that was never taken
+        """
+        with self._lock:
+            self._seq += 1
+            overwritten = self._frame is not None
+            self._frame = CapturedFrame(image, self._seq, captured_at, source_shape)
+            if overwritten:
+                self.overwritten += 1
+        self._wake()
+        return overwritten
+
+    def take(self) -> Optional[CapturedFrame]:
+        """Remove and return the newest frame, if any (non-blocking)."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+        return frame
+
+    async def get(self) -> Optional[CapturedFrame]:
+        """Wait for the next frame; None once the slot is closed and empty."""
+        while True:
+            frame = self.take()
+            if frame is not None or self.closed:
+                return frame
+            await self._ready.wait()
+            self._ready.clear()
+
+    def close(self):
+        """Signal that no more frames will come."""
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ready.set)
@@ -0,0 +1,156 @@
+"""PyAV (FFmpeg) stream frame reader."""
+import asyncio
+import time
+from threading import Thread
+from typing import AsyncIterator, Dict, Optional
+
+from core.ingestion.frame import CapturedFrame, LatestFrameSlot, PlanarFrame, fit_size
+from core.metrics.prometheus import record_ingest_frame
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _import_av():
+    try:
+        import av
+    except ImportError as e:
+        raise ImportError("The pyav decoder requires the 'av' package: pip install av") from e
+    return av
+
+
+class PyAVReader:
+    """
+    Async frame reader decoding with FFmpeg through PyAV in a thread.
+
+    Unlike cv2.VideoCapture, which converts every frame to BGR, frames stay
+    in the decoder's YUV format and are handed over as PlanarFrame: the
+    hybrid selector reads the Y plane without a copy and the colour
+    conversion only runs for the model that needs it, at its input size.
+    The codec decodes with FFmpeg's frame and slice threading.
+
+    With target_fps, frames ahead of that rate are skipped before any
+    conversion (they still have to be decoded, as later frames reference
+    them). Handed-over frames go to a LatestFrameSlot like RTSPReader's.
+
+    With working_size, handed-over frames are scaled in FFmpeg (swscale,
+    still in YUV) so their long side fits it: a 4K source never reaches
+    Python at full resolution, and skipped frames are never scaled.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        target_fps: Optional[float] = None,
+        stream_id: str = "default",
+        threads: int = 0,
+        options: Optional[Dict[str, str]] = None,
+        working_size: Optional[int] = None
+    ):
+        """
+        Args:
+            url: Stream URL or file path
+            target_fps: Frames per second to hand over (None = all)
+            stream_id: Stream ID for metrics
+            threads: Decoder threads (0 = FFmpeg picks from the CPU count)
+            options: FFmpeg demuxer options (RTSP defaults to TCP transport)
+            working_size: Long side frames are scaled down to (None = source resolution)
+        """
+        self.url = url
+        self.target_fps = target_fps
+        self.stream_id = stream_id
+        self.threads = threads
+        if options is None:
+            options = {"rtsp_transport": "tcp"} if url.startswith("rtsp://") else {}
+        self.options = options
+        self.working_size = working_size
+        self.slot = LatestFrameSlot()
+        self.thread: Optional[Thread] = None
+        self.running = False
+        self.frames_converted = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.error: Optional[str] = None  # Why decoding stopped, if it failed
+
+    def _read_loop(self):
+        """Background thread that decodes frames."""
+        av = _import_av()
+        try:
+            self._decode(av)
+        except av.error.FFmpegError as e:
+            self.error = str(e)
+            logger.error(f"[{self.stream_id}] PyAV decoding of {self.url} failed: {e}")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"[{self.stream_id}] PyAV reader for {self.url} failed: {e}", exc_info=True)
+        finally:
+            self.slot.close()
+
+    def _decode(self, av):
+        """Decode frames until stopped or the stream ends."""
+        container = av.open(self.url, options=self.options)
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"  # Frame and slice threading
+            stream.codec_context.thread_count = self.threads
+
+            interval = 1.0 / self.target_fps if self.target_fps else 0.0
+            next_due = time.monotonic()
+            for frame in container.decode(stream):
+                if not self.running:
+                    break
+
+                # Skip frames ahead of the target rate before any conversion
+                now = time.monotonic()
+                if now < next_due:
+                    self.frames_skipped += 1
+                    record_ingest_frame(self.stream_id, "skipped")
+                    continue
+                # Stay on schedule, but don't burst to catch up after a stall
+                next_due = next_due + interval if now - next_due < interval else now + interval
+
+                self.frames_converted += 1
+                record_ingest_frame(self.stream_id, "converted")
+
+                source_shape = None
+                size = fit_size(frame.width, frame.height, self.working_size)
+                if size != (frame.width, frame.height):
+                    source_shape = (frame.height, frame.width)
+                    frame = frame.reformat(width=size[0], height=size[1], interpolation="AREA")
+
+                # Replace a frame the consumer hasn't taken yet
+                if self.slot.put(PlanarFrame(frame), now, source_shape):
+                    self.frames_dropped += 1
+                    record_ingest_frame(self.stream_id, "dropped")
+        finally:
+            container.close()
+
+    async def start(self):
+        """Start decoding frames."""
+        _import_av()  # Fail here rather than in the thread
+        self.running = True
+        self.slot.bind(asyncio.get_running_loop())
+        self.thread = Thread(target=self._read_loop, daemon=True)
+        self.thread.start()
+
+        # Wait a bit for first frame
+        await asyncio.sleep(0.1)
+
+    async def stop(self):
+        """Stop decoding frames."""
+        self.running = False
+        self.slot.close()
+        if self.thread:
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join, 2.0)
+
+    async def read_frame(self) -> Optional[CapturedFrame]:
+        """Read the newest frame (non-blocking)."""
+        return self.slot.take()
+
+    async def frames(self) -> AsyncIterator[CapturedFrame]:
+        """Async iterator of the newest frames, woken as soon as one is decoded."""
+        while self.running:
+            frame = await self.slot.get()
+            if frame is None:
+                break
+            yield frame
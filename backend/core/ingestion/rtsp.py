@@ -1,52 +1,110 @@
 """RTSP stream frame reader."""
 import cv2
 import asyncio
+import time
 from typing import AsyncIterator, Optional
-import numpy as np
 from threading import Thread
-from queue import Queue
+
+from core.ingestion.frame import CapturedFrame, LatestFrameSlot, downscale
+from core.metrics.prometheus import record_ingest_frame
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class RTSPReader:
-    """Async RTSP frame reader using OpenCV VideoCapture in a thread."""
+    """
+    Async RTSP frame reader using OpenCV VideoCapture in a thread.
+    
+    With target_fps, every camera frame is still grabbed (to keep up with the
+    stream) but only frames due at that rate are fetched with retrieve(); the
+    rest are skipped decoded but not converted (grab() decodes with OpenCV's
+    FFmpeg backend; the BGR conversion and copy are what is saved).
+    
+    Converted frames go to a LatestFrameSlot stamped with their capture time;
+    a frame the consumer hasn't taken when the next one arrives is dropped.
     
-    def __init__(self, url: str, buffer_size: int = 2):
+    With working_size, converted frames are shrunk in the reader thread before
+    they are handed over. OpenCV still decodes at full resolution; the pyav
+    decoder avoids that.
+    """
+    
+    def __init__(
+        self,
+        url: str,
+        target_fps: Optional[float] = None,
+        stream_id: str = "default",
+        working_size: Optional[int] = None
+    ):
         self.url = url
-        self.buffer_size = buffer_size
-        self.queue: Queue = Queue(maxsize=buffer_size)
+        self.target_fps = target_fps
+        self.stream_id = stream_id
+        self.working_size = working_size
+        self.slot = LatestFrameSlot()
         self.cap: Optional[cv2.VideoCapture] = None
         self.thread: Optional[Thread] = None
         self.running = False
+        self.frames_converted = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.error: Optional[str] = None  # Why reading stopped, if it failed
     
     def _read_loop(self):
         """Background thread that reads frames."""
+        try:
+            self._capture()
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"[{self.stream_id}] RTSP reading failed: {e}")
+        finally:
+            self.slot.close()
+    
+    def _capture(self):
+        """Grab frames until stopped or the stream ends."""
         cap = cv2.VideoCapture(self.url)
         if not cap.isOpened():
             raise RuntimeError(f"Failed to open RTSP stream: {self.url}")
         
         self.cap = cap
+        try:
+            self._grab_frames(cap)
+        finally:
+            cap.release()
+    
+    def _grab_frames(self, cap: cv2.VideoCapture):
+        """Grab, and at the target rate convert, frames into the slot."""
+        interval = 1.0 / self.target_fps if self.target_fps else 0.0
+        next_due = time.monotonic()
         while self.running:
-            ret, frame = cap.read()
+            if not cap.grab():
+                break
+            
+            # Skip frames ahead of the target rate before the BGR conversion
+            now = time.monotonic()
+            if now < next_due:
+                self.frames_skipped += 1
+                record_ingest_frame(self.stream_id, "skipped")
+                continue
+            # Stay on schedule, but don't burst to catch up after a stall
+            next_due = next_due + interval if now - next_due < interval else now + interval
+            
+            ret, frame = cap.retrieve()
             if not ret:
                 break
+            self.frames_converted += 1
+            record_ingest_frame(self.stream_id, "converted")
             
-            # Drop oldest frame if queue is full
-            if self.queue.full():
-                try:
-                    self.queue.get_nowait()
-                except:
-                    pass
+            frame, source_shape = downscale(frame, self.working_size)
             
-            try:
-                self.queue.put_nowait(frame)
-            except:
-                pass
-        
-        cap.release()
+            # Replace a frame the consumer hasn't taken yet
+            if self.slot.put(frame, now, source_shape):
+                self.frames_dropped += 1
+                record_ingest_frame(self.stream_id, "dropped")
     
     async def start(self):
         """Start reading frames."""
         self.running = True
+        self.slot.bind(asyncio.get_running_loop())
         self.thread = Thread(target=self._read_loop, daemon=True)
         self.thread.start()
         
@@ -56,23 +114,19 @@ class RTSPReader:
     async def stop(self):
         """Stop reading frames."""
         self.running = False
+        self.slot.close()
         if self.thread:
-            self.thread.join(timeout=2.0)
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join, 2.0)
     
-    async def read_frame(self) -> Optional[np.ndarray]:
-        """Read next frame (non-blocking)."""
-        try:
-            frame = self.queue.get_nowait()
-            return frame
-        except:
-            return None
+    async def read_frame(self) -> Optional[CapturedFrame]:
+        """Read the newest frame (non-blocking)."""
+        return self.slot.take()
     
-    async def frames(self) -> AsyncIterator[np.ndarray]:
-        """Async iterator of frames."""
+    async def frames(self) -> AsyncIterator[CapturedFrame]:
+        """Async iterator of the newest frames, woken as soon as one is captured."""
         while self.running:
-            frame = await self.read_frame()
-            if frame is not None:
-                yield frame
-            else:
-                await asyncio.sleep(0.01)  # Small delay if no frame
+            frame = await self.slot.get()
+            if frame is None:
+                break
+            yield frame
 
@@ -1,15 +1,19 @@
 """Webcam frame reader."""
 import cv2
 import asyncio
+import time
 from typing import AsyncIterator, Optional
 import numpy as np
 
+from core.ingestion.frame import CapturedFrame, downscale
+
 
 class WebcamReader:
-    """Async webcam reader."""
+    """Async webcam reader (frames optionally shrunk to a working size)."""
     
-    def __init__(self, device_index: int = 0):
+    def __init__(self, device_index: int = 0, working_size: Optional[int] = None):
         self.device_index = device_index
+        self.working_size = working_size
         self.cap: Optional[cv2.VideoCapture] = None
     
     async def start(self):
@@ -28,13 +32,17 @@ class WebcamReader:
             await loop.run_in_executor(None, self.cap.release)
             self.cap = None
     
-    async def frames(self) -> AsyncIterator[np.ndarray]:
+    async def frames(self) -> AsyncIterator[CapturedFrame]:
         """Async iterator of frames."""
         loop = asyncio.get_event_loop()
+        seq = 0
         while self.cap and self.cap.isOpened():
             ret, frame = await loop.run_in_executor(None, self.cap.read)
             if not ret:
                 break
-            yield frame
+            captured_at = time.monotonic()
+            frame, source_shape = await loop.run_in_executor(None, downscale, frame, self.working_size)
+            seq += 1
+            yield CapturedFrame(frame, seq, captured_at, source_shape)
             await asyncio.sleep(0.033)  # ~30 FPS
 
@@ -1,6 +1,6 @@
 """Prometheus metrics instrumentation."""
 from prometheus_client import Counter, Gauge, Histogram
-from typing import Optional
+from typing import List, Optional
 import time
 
 
@@ -48,6 +48,52 @@ stream_active = Gauge(
     []
 )
 
+batch_size = Histogram(
+    'inference_batch_size',
+    'Number of frames per batched forward pass',
+    ['model'],
+    buckets=[1, 2, 4, 8, 16, 32, 64]
+)
+
+batch_queue_wait = Histogram(
+    'inference_batch_queue_wait_ms',
+    'Time a frame waited in the batch queue in milliseconds',
+    ['model'],
+    buckets=[1, 2, 5, 10, 15, 25, 50, 100]
+)
+
+batch_queue_depth = Gauge(
+    'inference_batch_queue_depth',
+    'Frames waiting in the batch queue',
+    ['model']
+)
+
+ws_dropped_total = Counter(
+    'ws_messages_dropped_total',
+    'Live WebSocket payloads dropped: superseded images or slow clients disconnected',
+    ['stream_id', 'reason']
+)
+
+ws_send_lag = Histogram(
+    'ws_send_lag_ms',
+    'Time a live message waited in a client send queue in milliseconds',
+    ['stream_id'],
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000]
+)
+
+ingest_frames_total = Counter(
+    'ingest_frames_total',
+    'Source frames by outcome: converted (handed over for processing), skipped (decoded but not converted), dropped (converted but superseded) or stale (too old to process)',
+    ['stream_id', 'outcome']
+)
+
+frame_age = Histogram(
+    'frame_age_ms',
+    'Time from frame capture to the end of its processing in milliseconds',
+    ['stream_id'],
+    buckets=[10, 25, 50, 100, 250, 500, 1000, 2500]
+)
+
 
 class InferenceTimer:
     """Context manager for timing inference."""
@@ -100,3 +146,31 @@ def record_stream_active(count: int):
     """Record number of active streams."""
     stream_active.set(count)
 
+
+
+def record_batch(model: str, size: int, queue_wait_ms: List[float], queue_depth: int):
+    """Record a batched forward pass and how long its frames waited."""
+    batch_size.labels(model=model).observe(size)
+    for wait_ms in queue_wait_ms:
+        batch_queue_wait.labels(model=model).observe(wait_ms)
+    batch_queue_depth.labels(model=model).set(queue_depth)
+
+
+def record_ws_dropped(stream_id: str, reason: str = "superseded_image"):
+    """Record a live payload dropped for a WebSocket client."""
+    ws_dropped_total.labels(stream_id=stream_id, reason=reason).inc()
+
+
+def record_ws_send_lag(stream_id: str, lag_ms: float):
+    """Record how long a live message waited before being sent."""
+    ws_send_lag.labels(stream_id=stream_id).observe(lag_ms)
+
+
+def record_ingest_frame(stream_id: str, outcome: str):
+    """Record what happened to a source frame (converted, skipped, dropped or stale)."""
+    ingest_frames_total.labels(stream_id=stream_id, outcome=outcome).inc()
+
+
+def record_frame_age(stream_id: str, age_ms: float):
+    """Record how old a frame was when its processing finished."""
+    frame_age.labels(stream_id=stream_id).observe(age_ms)
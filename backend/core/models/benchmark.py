@@ -0,0 +1,198 @@
+"""
+Benchmark model variants on a reference clip.
+
+Usage:
+    python -m core.models.benchmark precision --model csrnet --clip ref.mp4 --precisions bf16 int8
+    python -m core.models.benchmark precision --model yolo --clip ref.mp4 --precisions bf16 int8
+    python -m core.models.benchmark latency --input-size 768 --frame-size 1920x1080
+
+YOLO int8 runs on the ONNX runtime and needs the artifact from
+`python -m core.models.export yolo --int8`.
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.ingestion.file import read_sample_frames
+
+
+def _count(model_kind: str, output: Any) -> float:
+    """Crowd count from a model output."""
+    if model_kind == "yolo":
+        return float(len(output))
+    return float(output.sum())
+
+
+def run_model(model: Any, model_kind: str, frames: List[np.ndarray], warmup: int = 3) -> Dict[str, Any]:
+    """
+    Run a model over frames, timing each call.
+
+    Returns:
+        {"counts": [...], "latency_ms": [...]}
+    """
+    for frame in frames[:warmup]:
+        model.infer(frame)
+
+    counts, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        output = model.infer(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts.append(_count(model_kind, output))
+    return {"counts": counts, "latency_ms": latencies}
+
+
+def compare_precisions(
+    model_kind: str,
+    load: Callable[[str], Any],
+    frames: List[np.ndarray],
+    precisions: List[str],
+) -> List[Dict[str, Any]]:
+    """
+    Compare reduced-precision variants against fp32 on the same frames.
+
+    Args:
+        model_kind: "yolo" or "csrnet"
+        load: Loads the model for a precision
+        frames: Reference frames
+        precisions: Precisions to compare (fp32 is always the baseline)
+
+    Returns:
+        One row per precision with latency and count error vs fp32
+    """
+    baseline = run_model(load("fp32"), model_kind, frames)
+    base_counts = np.array(baseline["counts"])
+
+    rows = []
+    for precision in ["fp32"] + [p for p in precisions if p != "fp32"]:
+        run = baseline if precision == "fp32" else run_model(load(precision), model_kind, frames)
+        counts = np.array(run["counts"])
+        latency = np.array(run["latency_ms"])
+        abs_err = np.abs(counts - base_counts)
+        rows.append({
+            "precision": precision,
+            "latency_ms_mean": float(latency.mean()),
+            "latency_ms_p95": float(np.percentile(latency, 95)),
+            "speedup": float(np.array(baseline["latency_ms"]).mean() / latency.mean()),
+            "count_mean": float(counts.mean()),
+            "count_mae": float(abs_err.mean()),
+            "count_rel_err_pct": float((abs_err / np.maximum(base_counts, 1.0)).mean() * 100),
+        })
+    return rows
+
+
+def csrnet_latency(
+    input_size: int = 768,
+    frame_size: Tuple[int, int] = (1920, 1080),
+    iterations: int = 30,
+    weights: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Per-frame CSRNet latency (preprocess + forward + postprocess) on CPU.
+
+    Compares the plain eager model with the optimized fp32 path
+    (inference_mode, TorchScript freeze, fused conv+ReLU) and bf16.
+    """
+    from core.models.csrnet import CSRNetInference
+
+    width, height = frame_size
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    frames = (frames * (iterations // len(frames) + 1))[:iterations]
+
+    optimized = CSRNetInference(model_path=weights, input_size=input_size)
+    eager = CSRNetInference(model_path=weights, input_size=input_size)
+    eager.runner = eager.model
+    variants = {
+        "fp32-eager": eager,
+        "fp32-optimized": optimized,
+        "bf16": CSRNetInference(model_path=weights, input_size=input_size, precision="bf16"),
+    }
+
+    rows = []
+    for name, model in variants.items():
+        latency = np.array(run_model(model, "csrnet", frames)["latency_ms"])
+        rows.append({
+            "variant": name,
+            "input_size": input_size,
+            "latency_ms_mean": float(latency.mean()),
+            "latency_ms_p50": float(np.percentile(latency, 50)),
+            "latency_ms_p95": float(np.percentile(latency, 95)),
+            "fps": float(1000.0 / latency.mean()),
+        })
+    return rows
+
+
+def print_rows(rows: List[Dict[str, Any]]):
+    """Print benchmark rows as a table."""
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    print("  ".join(f"{h:>18}" for h in headers))
+    for row in rows:
+        print("  ".join(f"{v:>18.3f}" if isinstance(v, float) else f"{v:>18}" for v in row.values()))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point."""
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Benchmark model variants")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    precision = sub.add_parser("precision", help="Accuracy and latency of reduced precision vs fp32")
+    precision.add_argument("--model", choices=["yolo", "csrnet"], required=True)
+    precision.add_argument("--clip", required=True, help="Reference video")
+    precision.add_argument("--frames", type=int, default=100, help="Frames sampled from the clip")
+    precision.add_argument("--precisions", nargs="+", default=["bf16", "int8"], choices=["fp32", "bf16", "int8"])
+    precision.add_argument("--yolo-model", default=settings.YOLO_MODEL_PATH)
+    precision.add_argument("--imgsz", type=int, default=960)
+    precision.add_argument("--input-size", type=int, default=768)
+    precision.add_argument("--model-dir", default=settings.MODEL_DIR, help="Exported ONNX artifacts (YOLO int8)")
+    latency = sub.add_parser("latency", help="CSRNet per-frame CPU latency")
+    latency.add_argument("--input-size", type=int, default=768)
+    latency.add_argument("--frame-size", default="1920x1080", help="WIDTHxHEIGHT of synthetic frames")
+    latency.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.command == "latency":
+        import torch
+        width, height = (int(v) for v in args.frame_size.lower().split("x"))
+        print(f"CSRNet latency, input_size={args.input_size}, frame={width}x{height}, threads={torch.get_num_threads()}")
+        print_rows(csrnet_latency(args.input_size, (width, height), args.iterations, settings.CSRNET_MODEL_PATH))
+        return
+
+    frames = read_sample_frames(args.clip, args.frames)
+    if args.model == "yolo":
+        from core.models.yolo import YoloDetector
+
+        def load(p: str):
+            if p != "int8":
+                return YoloDetector(model_path=args.yolo_model, img_size=args.imgsz, precision=p)
+            # PyTorch YOLO has no int8 path; use the quantized ONNX export
+            from core.models.export import artifact_path
+            from core.models.onnx_runtime import YoloOnnxDetector
+            return YoloOnnxDetector(
+                model_path=str(artifact_path(args.model_dir, "yolo", args.yolo_model, args.imgsz, precision=p)),
+                img_size=args.imgsz,
+                intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+                inter_op_threads=settings.ONNX_INTER_OP_THREADS,
+            )
+    else:
+        from core.models.csrnet import CSRNetInference
+        calibration = read_sample_frames(args.clip, settings.QUANT_CALIBRATION_FRAMES)
+        load = lambda p: CSRNetInference(
+            model_path=settings.CSRNET_MODEL_PATH,
+            input_size=args.input_size,
+            precision=p,
+            calibration_frames=calibration,
+        )
+
+    print(f"{args.model} on {args.clip} ({len(frames)} frames)")
+    print_rows(compare_precisions(args.model, load, frames, args.precisions))
+
+
+if __name__ == "__main__":
+    main()
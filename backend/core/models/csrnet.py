@@ -3,34 +3,147 @@ import torch
 import torch.nn as nn
 import numpy as np
 import cv2
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 from pathlib import Path
 from core.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+# VGG-16 front-end (first 10 conv layers) and dilated back-end from the CSRNet paper
+FRONTEND_CFG = [64, 64, "M", 128, 128, "M", 256, 256, 256, "M", 512, 512, 512]
+BACKEND_CFG = [512, 512, 512, 256, 128, 64]
+
+
+def make_layers(cfg: List, in_channels: int = 3, dilation: int = 1) -> nn.Sequential:
+    """Build a stack of 3x3 conv+ReLU layers with max-pooling at "M"."""
+    layers = []
+    for v in cfg:
+        if v == "M":
+            layers.append(nn.MaxPool2d(kernel_size=2, stride=2))
+        else:
+            layers.append(nn.Conv2d(in_channels, v, kernel_size=3, padding=dilation, dilation=dilation))
+            layers.append(nn.ReLU(inplace=True))
+            in_channels = v
+    return nn.Sequential(*layers)
+
 
 class CSRNet(nn.Module):
-    """CSRNet model architecture (stub - needs real weights)."""
+    """
+    CSRNet (Li et al., CVPR 2018): VGG-16 front-end + dilated conv back-end.
     
-    def __init__(self, load_weights: bool = True):
+    The output density map is 1/8 of the input resolution. Layer names match
+    the reference implementation, so its checkpoints load directly.
+    """
+    
+    def __init__(self, pretrained_frontend: bool = False):
         super(CSRNet, self).__init__()
-        # TODO: Implement full CSRNet architecture
-        # For now, this is a placeholder
-        self.conv = nn.Conv2d(3, 1, 3, padding=1)
-        if load_weights:
-            # TODO: Load actual weights
-            pass
+        self.frontend = make_layers(FRONTEND_CFG)
+        self.backend = make_layers(BACKEND_CFG, in_channels=512, dilation=2)
+        self.output_layer = nn.Conv2d(64, 1, kernel_size=1)
+        self._init_weights()
+        if pretrained_frontend:
+            self._load_vgg16_frontend()
+    
+    def _init_weights(self):
+        for m in self.modules():
+            if isinstance(m, nn.Conv2d):
+                nn.init.normal_(m.weight, std=0.01)
+                nn.init.constant_(m.bias, 0)
+    
+    def _load_vgg16_frontend(self):
+        """Initialize the front-end from ImageNet VGG-16 (for training)."""
+        from torchvision import models
+        vgg = models.vgg16(weights=models.VGG16_Weights.IMAGENET1K_V1)
+        frontend_state = self.frontend.state_dict()
+        vgg_state = list(vgg.features.state_dict().values())
+        for i, key in enumerate(frontend_state):
+            frontend_state[key] = vgg_state[i]
+        self.frontend.load_state_dict(frontend_state)
     
     def forward(self, x):
-        # TODO: Implement forward pass
-        return self.conv(x)
+        x = self.frontend(x)
+        x = self.backend(x)
+        return self.output_layer(x)
+
+
+def load_checkpoint(model: nn.Module, model_path: str, device: torch.device):
+    """
+    Load CSRNet weights from a plain state dict or a training checkpoint.
+    
+    Handles {"state_dict": ...} checkpoints and "module." prefixes from
+    DataParallel training.
+    """
+    checkpoint = torch.load(model_path, map_location=device)
+    state_dict = checkpoint.get("state_dict", checkpoint) if isinstance(checkpoint, dict) else checkpoint
+    state_dict = {k[len("module."):] if k.startswith("module.") else k: v for k, v in state_dict.items()}
+    model.load_state_dict(state_dict)
+
+
+class DensityMap:
+    """
+    Density map at model output resolution plus its mapping to frame pixels.
+    
+    CSRNet predicts one cell per ~8x8 input pixels. The map is kept at that
+    resolution: cell (i, j) covers frame pixels [j*sx, (j+1)*sx) x
+    [i*sy, (i+1)*sy) where (sx, sy) = scale. Its sum is the crowd count, so
+    counts and zone integrals are computed here; upsample() is only needed
+    when something wants a frame-sized array.
+    """
+    __slots__ = ("data", "frame_shape")
+    
+    def __init__(self, data: np.ndarray, frame_shape: Tuple[int, int]):
+        self.data = data
+        self.frame_shape = (int(frame_shape[0]), int(frame_shape[1]))
+    
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.data.shape
+    
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """(sx, sy) frame pixels per map cell."""
+        h, w = self.frame_shape
+        return w / self.data.shape[1], h / self.data.shape[0]
+    
+    def sum(self) -> float:
+        """Total count."""
+        return float(self.data.sum())
+    
+    def upsample(self, shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Resample to frame resolution (or shape), preserving the total count.
+        
+        Args:
+            shape: (H, W) of the output (defaults to the frame shape)
+            
+        Returns:
+            Density map (H, W) with the same sum
+        """
+        h, w = shape or self.frame_shape
+        if (h, w) == self.data.shape:
+            return self.data
+        resized = cv2.resize(self.data, (w, h), interpolation=cv2.INTER_LINEAR)
+        resized_sum = float(resized.sum())
+        if resized_sum > 0:
+            resized *= self.sum() / resized_sum
+        return resized
 
 
 class CSRNetInference:
     """CSRNet inference wrapper."""
     
-    def __init__(self, model_path: Optional[str] = None, input_size: int = 768, device: str = "cpu"):
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        input_size: int = 768,
+        device: str = "cpu",
+        precision: str = "fp32",
+        calibration_frames: Optional[List[np.ndarray]] = None,
+        model: Optional[nn.Module] = None,
+    ):
         """
         Initialize CSRNet inference.
         
@@ -38,25 +151,82 @@ class CSRNetInference:
             model_path: Path to model weights (.pt or .pth)
             input_size: Input size (long side)
             device: Device to run inference on ('cpu' or 'cuda')
+            precision: "fp32", "bf16" (CPU autocast, channels_last) or "int8" (static quantization)
+            calibration_frames: BGR frames used to calibrate int8 activation ranges
+            model: Ready-to-run module (e.g. a TorchScript artifact), used as is
+                without loading weights or optimizing
         """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
         self.input_size = input_size
         self.device = torch.device(device)
+        self.precision = precision
+        
+        if model is not None:
+            self.model = model.eval()
+            self.runner = self.model
+            return
         
         # Load model
+        self.model = CSRNet()
         if model_path and Path(model_path).exists():
-            # TODO: Load actual model weights
-            self.model = CSRNet(load_weights=True)
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+            load_checkpoint(self.model, model_path, self.device)
         else:
-            # Use stub for now
-            self.model = CSRNet(load_weights=False)
+            logger.warning("CSRNet weights not found - using untrained model, counts will be meaningless")
         
         self.model.to(self.device)
         self.model.eval()
         
         # Ensure model is in float32 mode
         self.model = self.model.float()
-        logger.info(f"CSRNet model initialized on {self.device}, dtype=float32")
+        
+        # self.model stays the eager module (export, quantization); self.runner is what infers
+        self.runner = self.model
+        if precision == "fp32":
+            self.runner = self._optimize_fp32()
+        elif precision == "bf16":
+            self.model = self.model.to(memory_format=torch.channels_last)
+            self.runner = self.model
+        elif precision == "int8":
+            if not calibration_frames:
+                raise ValueError("int8 precision requires calibration frames")
+            self.runner = self._quantize_int8(calibration_frames)
+        logger.info(f"CSRNet model initialized on {self.device}, precision={precision}")
+    
+    def _optimize_fp32(self) -> nn.Module:
+        """
+        Freeze the model with TorchScript and apply inference optimizations.
+        
+        On CPU this folds conv+ReLU into fused oneDNN kernels and converts
+        weights to a channels_last/blocked layout. Falls back to the eager
+        model if the JIT is unavailable.
+        """
+        if self.device.type != "cpu":
+            return self.model
+        try:
+            scripted = torch.jit.script(self.model)
+            return torch.jit.optimize_for_inference(scripted)
+        except Exception as e:
+            logger.warning(f"CSRNet TorchScript optimization failed, using eager model: {e}")
+            return self.model
+    
+    def _quantize_int8(self, calibration_frames: List[np.ndarray]) -> nn.Module:
+        """Statically quantize the model, calibrating activation ranges on sample frames."""
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+        
+        if self.device.type != "cpu":
+            raise ValueError("int8 precision is only supported on CPU")
+        
+        example = self.preprocess(calibration_frames[0])
+        prepared = prepare_fx(self.model, get_default_qconfig_mapping("x86"), (example,))
+        with torch.no_grad():
+            for frame in calibration_frames:
+                prepared(self.preprocess(frame))
+        quantized = convert_fx(prepared)
+        quantized.eval()
+        logger.info(f"CSRNet quantized to int8 using {len(calibration_frames)} calibration frames")
+        return quantized
     
     def preprocess(self, image: np.ndarray) -> torch.Tensor:
         """
@@ -90,30 +260,33 @@ class CSRNetInference:
         tensor = tensor.to(dtype=torch.float32)  # Ensure float32, not float64 (double)
         return tensor.to(self.device)
     
-    def postprocess(self, density_map: torch.Tensor, original_shape: Tuple[int, int]) -> np.ndarray:
+    def postprocess(self, density_map: torch.Tensor, original_shape: Tuple[int, int]) -> DensityMap:
         """
-        Postprocess density map to original image size.
+        Postprocess model output into a DensityMap.
+        
+        The map stays at model resolution; it is not resized to the frame.
         
         Args:
             density_map: Model output (1, 1, H', W')
             original_shape: (H, W) of original image
             
         Returns:
-            Density map resized to original size (H, W)
+            DensityMap over the original image
         """
-        # Remove batch and channel dimensions
-        density = density_map.squeeze().cpu().numpy()
-        
-        # Resize to original size
-        h, w = original_shape
-        density_resized = cv2.resize(density, (w, h), interpolation=cv2.INTER_LINEAR)
-        
-        # Ensure non-negative
-        density_resized = np.maximum(density_resized, 0)
-        
-        return density_resized
+        # Remove batch and channel dimensions; ensure non-negative
+        density = density_map.reshape(density_map.shape[-2:]).cpu().numpy()
+        return DensityMap(np.maximum(density, 0), original_shape)
     
-    def infer(self, image: np.ndarray) -> np.ndarray:
+    def forward(self, input_tensor: torch.Tensor) -> torch.Tensor:
+        """Run the model on a preprocessed (N, 3, H', W') tensor."""
+        with torch.inference_mode():
+            if self.precision == "bf16":
+                input_tensor = input_tensor.contiguous(memory_format=torch.channels_last)
+                with torch.autocast(device_type=self.device.type, dtype=torch.bfloat16):
+                    return self.runner(input_tensor).float()
+            return self.runner(input_tensor)
+    
+    def infer(self, image: np.ndarray) -> DensityMap:
         """
         Run inference on image.
         
@@ -121,7 +294,7 @@ class CSRNetInference:
             image: BGR image (numpy array)
             
         Returns:
-            Density map (H, W) where sum ≈ count
+            DensityMap at model resolution where sum ≈ count
         """
         original_shape = image.shape[:2]
         
@@ -134,22 +307,75 @@ class CSRNetInference:
             input_tensor = input_tensor.float()
         
         # Inference
-        with torch.no_grad():
-            output = self.model(input_tensor)
+        output = self.forward(input_tensor)
         
         # Postprocess
         density_map = self.postprocess(output, original_shape)
         
         return density_map
     
+    def infer_batch(self, images: List[np.ndarray]) -> List[DensityMap]:
+        """
+        Run a single batched forward pass over several images.
+        
+        Args:
+            images: BGR images, all with the same shape
+            
+        Returns:
+            DensityMap per image
+        """
+        if not images:
+            return []
+        original_shape = images[0].shape[:2]
+        
+        # Preprocess and stack along the batch dimension
+        input_tensor = torch.cat([self.preprocess(image) for image in images], dim=0)
+        
+        # Inference
+        output = self.forward(input_tensor)
+        
+        # Postprocess each map separately
+        return [self.postprocess(output[i:i + 1], original_shape) for i in range(len(images))]
+    
     def to_torchscript(self, output_path: str):
-        """Export model to TorchScript."""
-        # TODO: Implement TorchScript export
-        pass
+        """
+        Export model to TorchScript.
+        
+        Args:
+            output_path: Destination .pt file
+        """
+        example = torch.zeros(1, 3, self.input_size, self.input_size, device=self.device)
+        with torch.no_grad():
+            traced = torch.jit.trace(self.model, example)
+        traced.save(output_path)
+        logger.info(f"CSRNet exported to TorchScript: {output_path}")
+    
+    def to_onnx(self, output_path: str, opset: int = 17):
+        """
+        Export model to ONNX with dynamic batch and spatial dimensions.
+        
+        Args:
+            output_path: Destination .onnx file
+            opset: ONNX opset version
+        """
+        example = torch.zeros(1, 3, self.input_size, self.input_size, device=self.device)
+        torch.onnx.export(
+            self.model,
+            example,
+            output_path,
+            input_names=["images"],
+            output_names=["density"],
+            dynamic_axes={
+                "images": {0: "batch", 2: "height", 3: "width"},
+                "density": {0: "batch", 2: "height", 3: "width"},
+            },
+            opset_version=opset,
+        )
+        logger.info(f"CSRNet exported to ONNX: {output_path}")
     
     @staticmethod
-    def load_torchscript(model_path: str, device: str = "cpu"):
+    def load_torchscript(model_path: str, input_size: int = 768, device: str = "cpu") -> "CSRNetInference":
         """Load TorchScript model."""
-        # TODO: Implement TorchScript loading
-        return CSRNetInference(model_path=model_path, device=device)
-
+        module = torch.jit.load(model_path, map_location=torch.device(device))
+        logger.info(f"CSRNet TorchScript model loaded: {model_path}")
+        return CSRNetInference(input_size=input_size, device=device, model=module)
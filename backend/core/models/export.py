@@ -0,0 +1,200 @@
+"""
+Export YOLO and CSRNet to ONNX / TorchScript artifacts.
+
+Usage:
+    python -m core.models.export yolo --model yolov8n --imgsz 960
+    python -m core.models.export csrnet --weights csrnet_v1.pt --formats onnx torchscript
+    python -m core.models.export yolo --int8 --calibration-clip sample.mp4
+"""
+import argparse
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.ingestion.file import read_sample_frames
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_SUFFIXES = {"onnx": ".onnx", "torchscript": ".torchscript"}
+
+
+def artifact_path(
+    model_dir: str,
+    kind: str,
+    name: Optional[str],
+    input_size: int,
+    fmt: str = "onnx",
+    precision: str = "fp32"
+) -> Path:
+    """
+    Location of an exported artifact.
+
+    YOLO graphs have a static input size, so it is part of the file name.
+    CSRNet is exported with dynamic spatial axes and works at any input size.
+    Quantized ONNX graphs get an ".int8" suffix.
+    """
+    stem = Path(name).stem if name else "csrnet_stub"
+    if kind == "yolo":
+        stem = f"{stem}_{input_size}"
+    if precision != "fp32":
+        stem = f"{stem}.{precision}"
+    return Path(model_dir) / f"{stem}{FORMAT_SUFFIXES[fmt]}"
+
+
+def quantize_onnx_int8(
+    onnx_path: Path,
+    output_path: Path,
+    calibration_frames: List[np.ndarray],
+    preprocess: Callable[[np.ndarray], np.ndarray],
+):
+    """
+    Statically quantize an ONNX graph to int8 (QDQ format) for ONNX Runtime CPU.
+
+    Args:
+        onnx_path: fp32 ONNX model
+        output_path: Destination of the quantized model
+        calibration_frames: BGR frames used to calibrate activation ranges
+        preprocess: Converts a frame to the model's input array
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(calibration_frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: preprocess(frame)}
+
+    quantize_static(
+        str(onnx_path),
+        str(output_path),
+        FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    logger.info(f"Quantized {onnx_path} to int8 with {len(calibration_frames)} frames: {output_path}")
+
+
+def export_yolo(
+    model_name: str,
+    model_dir: str,
+    imgsz: int = 960,
+    formats: List[str] = ("onnx",),
+    calibration_frames: Optional[List[np.ndarray]] = None,
+) -> Dict[str, Path]:
+    """
+    Export a YOLO model through Ultralytics.
+
+    Args:
+        model_name: Model name (yolov8n, ...) or path to weights
+        model_dir: Output directory
+        imgsz: Static input size of the exported graph
+        formats: Any of "onnx", "torchscript"
+        calibration_frames: If given, also write an int8 ONNX model calibrated on them
+
+    Returns:
+        Mapping of format to artifact path
+    """
+    from ultralytics import YOLO
+
+    Path(model_dir).mkdir(parents=True, exist_ok=True)
+    model = YOLO(model_name)
+    outputs = {}
+    for fmt in formats:
+        exported = model.export(format=fmt, imgsz=imgsz, simplify=fmt == "onnx", verbose=False)
+        target = artifact_path(model_dir, "yolo", model_name, imgsz, fmt)
+        shutil.move(str(exported), target)
+        outputs[fmt] = target
+        logger.info(f"YOLO {model_name} exported to {fmt}: {target}")
+
+    if calibration_frames and "onnx" in outputs:
+        from core.models.onnx_runtime import yolo_input_blob
+        target = artifact_path(model_dir, "yolo", model_name, imgsz, "onnx", "int8")
+        quantize_onnx_int8(outputs["onnx"], target, calibration_frames, lambda f: yolo_input_blob(f, imgsz)[0])
+        outputs["onnx-int8"] = target
+    return outputs
+
+
+def export_csrnet(
+    weights: Optional[str],
+    model_dir: str,
+    input_size: int = 768,
+    formats: List[str] = ("onnx",),
+    calibration_frames: Optional[List[np.ndarray]] = None,
+) -> Dict[str, Path]:
+    """
+    Export CSRNet.
+
+    Args:
+        weights: Path to CSRNet weights (None exports the untrained model)
+        model_dir: Output directory
+        input_size: Example input size used for tracing
+        formats: Any of "onnx", "torchscript"
+        calibration_frames: If given, also write an int8 ONNX model calibrated on them
+
+    Returns:
+        Mapping of format to artifact path
+    """
+    from core.models.csrnet import CSRNetInference
+
+    Path(model_dir).mkdir(parents=True, exist_ok=True)
+    inference = CSRNetInference(model_path=weights, input_size=input_size)
+    outputs = {}
+    for fmt in formats:
+        target = artifact_path(model_dir, "csrnet", weights, input_size, fmt)
+        if fmt == "onnx":
+            inference.to_onnx(str(target))
+        else:
+            inference.to_torchscript(str(target))
+        outputs[fmt] = target
+
+    if calibration_frames and "onnx" in outputs:
+        target = artifact_path(model_dir, "csrnet", weights, input_size, "onnx", "int8")
+        quantize_onnx_int8(outputs["onnx"], target, calibration_frames, lambda f: inference.preprocess(f).numpy())
+        outputs["onnx-int8"] = target
+    return outputs
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point."""
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Export models to ONNX / TorchScript")
+    parser.add_argument("kind", choices=["yolo", "csrnet"])
+    parser.add_argument("--model", default=settings.YOLO_MODEL_PATH, help="YOLO model name or weights")
+    parser.add_argument("--weights", default=settings.CSRNET_MODEL_PATH, help="CSRNet weights")
+    parser.add_argument("--imgsz", type=int, default=960, help="YOLO input size")
+    parser.add_argument("--input-size", type=int, default=768, help="CSRNet example input size")
+    parser.add_argument("--formats", nargs="+", default=["onnx"], choices=list(FORMAT_SUFFIXES))
+    parser.add_argument("--output-dir", default=settings.MODEL_DIR)
+    parser.add_argument("--int8", action="store_true", help="Also write a statically quantized int8 ONNX model")
+    parser.add_argument("--calibration-clip", default=settings.QUANT_CALIBRATION_CLIP, help="Video used for int8 calibration")
+    parser.add_argument("--calibration-frames", type=int, default=settings.QUANT_CALIBRATION_FRAMES)
+    args = parser.parse_args(argv)
+
+    calibration_frames = None
+    if args.int8:
+        if not args.calibration_clip:
+            parser.error("--int8 requires --calibration-clip")
+        calibration_frames = read_sample_frames(args.calibration_clip, args.calibration_frames)
+
+    if args.kind == "yolo":
+        outputs = export_yolo(args.model, args.output_dir, args.imgsz, args.formats, calibration_frames)
+    else:
+        weights = args.weights if args.weights and Path(args.weights).exists() else None
+        outputs = export_csrnet(weights, args.output_dir, args.input_size, args.formats, calibration_frames)
+    for fmt, path in outputs.items():
+        print(f"{fmt}: {path}")
+
+
+if __name__ == "__main__":
+    main()
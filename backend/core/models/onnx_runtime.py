@@ -0,0 +1,180 @@
+"""ONNX Runtime CPU backends for YOLO and CSRNet."""
+import os
+import numpy as np
+import cv2
+import torch
+from typing import List, Optional
+
+from core.models.yolo import YoloDetector, BoxArray
+from core.models.csrnet import CSRNetInference
+from core.preprocess.utils import letterbox_resize
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def create_session(model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 1):
+    """
+    Create an optimized CPU ONNX Runtime session.
+
+    Args:
+        model_path: Path to .onnx file
+        intra_op_threads: Threads used inside an operator (0 = ONNX Runtime default)
+        inter_op_threads: Threads used across independent operators
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("ONNX runtime requires the 'onnxruntime' package: pip install onnxruntime") from e
+
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"ONNX model not found: {model_path}. Export it with: python -m core.models.export"
+        )
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+
+    session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    logger.info(
+        f"ONNX Runtime session created: {model_path} "
+        f"(intra_op={intra_op_threads or 'auto'}, inter_op={inter_op_threads})"
+    )
+    return session
+
+
+def yolo_input_blob(image: np.ndarray, img_size: int):
+    """
+    Letterbox a BGR image into an (1, 3, img_size, img_size) RGB float blob.
+
+    Returns:
+        blob, scale_factor, (pad_x, pad_y)
+    """
+    padded, scale, pad = letterbox_resize(image, img_size)
+    blob = cv2.dnn.blobFromImage(padded, 1 / 255.0, swapRB=True)
+    return blob, scale, pad
+
+
+class YoloOnnxDetector:
+    """YOLOv8-style person detector running on ONNX Runtime."""
+
+    # Same heatmap rendering as the PyTorch detector
+    boxes_to_heatmap = YoloDetector.boxes_to_heatmap
+
+    def __init__(
+        self,
+        model_path: str,
+        conf_threshold: float = 0.25,
+        img_size: int = 960,
+        iou_threshold: float = 0.7,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 1,
+    ):
+        """
+        Initialize ONNX YOLO detector.
+
+        Args:
+            model_path: Path to .onnx file (fp32 or int8) exported with a static img_size x img_size input
+            conf_threshold: Confidence threshold
+            img_size: Input image size (must match the export)
+            iou_threshold: NMS IoU threshold
+            intra_op_threads: ONNX Runtime intra-op threads (0 = default)
+            inter_op_threads: ONNX Runtime inter-op threads
+        """
+        logger.info(f"Initializing ONNX YOLO detector: model={model_path}, img_size={img_size}")
+        self.conf_threshold = conf_threshold
+        self.img_size = img_size
+        self.iou_threshold = iou_threshold
+        self.session = create_session(model_path, intra_op_threads, inter_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.memory_bytes = os.path.getsize(model_path)
+
+    def infer(self, image: np.ndarray, conf_threshold: Optional[float] = None) -> BoxArray:
+        """
+        Run inference on image.
+
+        Args:
+            image: BGR image (numpy array)
+            conf_threshold: Per-call confidence threshold (defaults to the detector's)
+
+        Returns:
+            Detected boxes (person class only)
+        """
+        conf = conf_threshold if conf_threshold is not None else self.conf_threshold
+        try:
+            blob, scale, (pad_x, pad_y) = yolo_input_blob(image, self.img_size)
+            output = self.session.run(None, {self.input_name: blob})[0][0]  # (4 + classes, N)
+            boxes = self._decode(output, conf, scale, pad_x, pad_y, image.shape[:2])
+            logger.debug(f"YOLO (ONNX) detected {len(boxes)} persons")
+            return boxes
+        except Exception as e:
+            logger.error(f"YOLO ONNX inference error: {e}", exc_info=True)
+            return BoxArray()
+
+    def infer_batch(self, images: List[np.ndarray], conf_threshold: Optional[float] = None) -> List[BoxArray]:
+        """Run inference on several images (the exported graph has a static batch of 1)."""
+        return [self.infer(image, conf_threshold) for image in images]
+
+    def _decode(self, output: np.ndarray, conf: float, scale: float, pad_x: int, pad_y: int, image_shape) -> BoxArray:
+        """Filter person predictions, apply NMS and map boxes back to the original image."""
+        class_scores = output[4:]
+        person = (class_scores.argmax(axis=0) == 0) & (class_scores[0] >= conf)
+        if not person.any():
+            return BoxArray()
+
+        cx, cy, w, h = output[:4, person]
+        scores = class_scores[0, person]
+        xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        keep = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), conf, self.iou_threshold)
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+
+        # Undo letterbox
+        xywh = xywh[keep]
+        height, width = image_shape
+        data = np.empty((len(keep), 6), dtype=np.float32)
+        data[:, 0] = np.clip((xywh[:, 0] - pad_x) / scale, 0, width)
+        data[:, 1] = np.clip((xywh[:, 1] - pad_y) / scale, 0, height)
+        data[:, 2] = np.clip((xywh[:, 0] + xywh[:, 2] - pad_x) / scale, 0, width)
+        data[:, 3] = np.clip((xywh[:, 1] + xywh[:, 3] - pad_y) / scale, 0, height)
+        data[:, 4] = scores[keep]
+        data[:, 5] = 0
+        return BoxArray(data)
+
+
+class CSRNetOnnxInference(CSRNetInference):
+    """CSRNet running on ONNX Runtime; pre/postprocessing is shared with the PyTorch wrapper."""
+
+    def __init__(
+        self,
+        model_path: str,
+        input_size: int = 768,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 1,
+    ):
+        """
+        Initialize ONNX CSRNet inference.
+
+        Args:
+            model_path: Path to .onnx file (fp32 or int8)
+            input_size: Input size (long side)
+            intra_op_threads: ONNX Runtime intra-op threads (0 = default)
+            inter_op_threads: ONNX Runtime inter-op threads
+        """
+        self.input_size = input_size
+        self.device = torch.device("cpu")
+        self.precision = "fp32"  # Quantization is baked into the graph
+        self.session = create_session(model_path, intra_op_threads, inter_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.memory_bytes = os.path.getsize(model_path)
+        logger.info(f"CSRNet ONNX model initialized: {model_path}")
+
+    def forward(self, input_tensor: torch.Tensor) -> torch.Tensor:
+        """Run the ONNX graph on a preprocessed (N, 3, H', W') tensor."""
+        output = self.session.run(None, {self.input_name: input_tensor.numpy()})[0]
+        return torch.from_numpy(output)
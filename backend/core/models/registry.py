@@ -0,0 +1,155 @@
+"""Process-wide registry of shared, reference-counted model instances."""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import torch
+
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ModelKey(NamedTuple):
+    """Identity of a loaded model; streams with equal keys share one instance."""
+    kind: str  # "yolo" | "csrnet"
+    name: str  # model name or weights path
+    input_size: int  # imgsz / input_size
+    precision: str = "fp32"
+    device: str = "cpu"
+    runtime: str = "torch"  # "torch" | "onnx"
+
+
+@dataclass
+class _Entry:
+    """A loaded model and its bookkeeping."""
+    model: Any
+    load_time_ms: float
+    memory_bytes: int
+    refcount: int = 0
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+def model_memory_bytes(model: Any) -> int:
+    """Estimate the memory footprint of a wrapper's parameters and buffers."""
+    # Non-torch runtimes report their own size
+    if isinstance(getattr(model, "memory_bytes", None), int):
+        return model.memory_bytes
+    module = model
+    # Unwrap e.g. YoloDetector -> ultralytics.YOLO -> nn.Module
+    for _ in range(3):
+        if isinstance(module, torch.nn.Module):
+            break
+        module = getattr(module, "model", None)
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Hand out shared model instances keyed by ModelKey.
+
+    acquire() loads a model on first use and increments its refcount;
+    release() decrements it. Models with no users stay cached so a stream
+    restart doesn't pay a cold load, but only the max_idle most recently
+    used idle models are kept.
+    """
+
+    def __init__(self, max_idle: int = 2):
+        self.max_idle = max_idle
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._idle: "OrderedDict[ModelKey, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+
+    def acquire(self, key: ModelKey, factory: Callable[[], Any]) -> Any:
+        """
+        Get a shared model instance, loading it with factory if needed.
+
+        Args:
+            key: Model identity
+            factory: Callable that loads the model
+
+        Returns:
+            Shared model instance (call release() when done)
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Serialize loads per key so concurrent streams don't load twice
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_used = time.time()
+                    self._idle.pop(key, None)
+                    logger.debug(f"Reusing model {key} (refcount={entry.refcount})")
+                    return entry.model
+
+            start = time.perf_counter()
+            model = factory()
+            load_time_ms = (time.perf_counter() - start) * 1000
+            entry = _Entry(
+                model=model,
+                load_time_ms=load_time_ms,
+                memory_bytes=model_memory_bytes(model),
+                refcount=1,
+            )
+            with self._lock:
+                self._entries[key] = entry
+            logger.info(
+                f"Loaded model {key} in {load_time_ms:.0f}ms "
+                f"({entry.memory_bytes / 1e6:.1f} MB)"
+            )
+            return model
+
+    def release(self, key: ModelKey):
+        """Drop a reference; idle models beyond max_idle are evicted (LRU)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.time()
+            if entry.refcount > 0:
+                return
+
+            self._idle[key] = None
+            self._idle.move_to_end(key)
+            while len(self._idle) > self.max_idle:
+                evicted, _ = self._idle.popitem(last=False)
+                # Its load lock stays: a concurrent acquire may hold or wait on it
+                del self._entries[evicted]
+                logger.info(f"Evicted idle model {evicted}")
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """Describe loaded models for the /models endpoint."""
+        with self._lock:
+            return [
+                {
+                    **key._asdict(),
+                    "refcount": entry.refcount,
+                    "memory_bytes": entry.memory_bytes,
+                    "load_time_ms": round(entry.load_time_ms, 1),
+                    "loaded_at": entry.loaded_at,
+                    "last_used": entry.last_used,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def clear(self):
+        """Drop all cached models."""
+        with self._lock:
+            self._entries.clear()
+            self._idle.clear()
+            self._load_locks.clear()
+
+
+# Shared registry for this process
+model_registry = ModelRegistry()
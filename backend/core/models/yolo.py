@@ -18,6 +18,7 @@ torch.load = _patched_torch_load
 from ultralytics import YOLO
 import numpy as np
 import cv2
+import threading
 from typing import List, Optional, Tuple
 from dataclasses import dataclass
 from core.utils.logger import get_logger
@@ -36,10 +37,87 @@ class Box:
     cls: int  # class ID (0 = person)
 
 
+class BoxArray:
+    """
+    Columnar bounding boxes: a single (N, 6) float32 array.
+    
+    Columns are x1, y1, x2, y2, conf, cls; the properties return views, so
+    downstream code can work on all boxes at once without per-box objects.
+    """
+    
+    __slots__ = ("data",)
+    
+    def __init__(self, data: Optional[np.ndarray] = None):
+        if data is None:
+            data = np.empty((0, 6), dtype=np.float32)
+        self.data = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, 6)
+    
+    def __len__(self) -> int:
+        return self.data.shape[0]
+    
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data[:, :4]
+    
+    @property
+    def x1(self) -> np.ndarray:
+        return self.data[:, 0]
+    
+    @property
+    def y1(self) -> np.ndarray:
+        return self.data[:, 1]
+    
+    @property
+    def x2(self) -> np.ndarray:
+        return self.data[:, 2]
+    
+    @property
+    def y2(self) -> np.ndarray:
+        return self.data[:, 3]
+    
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data[:, 4]
+    
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data[:, 5]
+    
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Box centers as integer pixel coordinates (cx, cy)."""
+        cx = ((self.x1 + self.x2) / 2).astype(np.int32)
+        cy = ((self.y1 + self.y2) / 2).astype(np.int32)
+        return cx, cy
+    
+    def foot_points(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Bottom centers (where people stand) as integer pixel coordinates (x, y)."""
+        x = ((self.x1 + self.x2) / 2).astype(np.int32)
+        return x, self.y2.astype(np.int32)
+    
+    def rescale(self, sx: float, sy: float) -> "BoxArray":
+        """Scale box coordinates in place (e.g. from a downscaled image back to the frame)."""
+        self.data[:, [0, 2]] *= sx
+        self.data[:, [1, 3]] *= sy
+        return self
+    
+    def to_boxes(self) -> List[Box]:
+        """Convert to a list of Box objects (for code that needs them)."""
+        return [
+            Box(x1=x1, y1=y1, x2=x2, y2=y2, conf=conf, cls=int(cls))
+            for x1, y1, x2, y2, conf, cls in self.data.tolist()
+        ]
+
+
 class YoloDetector:
     """YOLO detector for person detection."""
     
-    def __init__(self, model_path: str = "yolov8n", conf_threshold: float = 0.25, img_size: int = 960):
+    def __init__(
+        self,
+        model_path: str = "yolov8n",
+        conf_threshold: float = 0.25,
+        img_size: int = 960,
+        precision: str = "fp32"
+    ):
         """
         Initialize YOLO detector.
         
@@ -47,90 +125,139 @@ class YoloDetector:
             model_path: Model name (yolov8n, yolov8s) or path to weights
             conf_threshold: Confidence threshold
             img_size: Input image size (long side)
+            precision: "fp32" or "bf16" (CPU autocast, channels_last); int8 needs the ONNX runtime
         """
-        logger.info(f"Initializing YOLO detector: model={model_path}, conf={conf_threshold}, img_size={img_size}")
+        if precision not in ("fp32", "bf16"):
+            raise ValueError(f"Unsupported precision for PyTorch YOLO: {precision} (use the onnx runtime for int8)")
+        logger.info(
+            f"Initializing YOLO detector: model={model_path}, conf={conf_threshold}, "
+            f"img_size={img_size}, precision={precision}"
+        )
         try:
             self.conf_threshold = conf_threshold
             self.img_size = img_size
+            self.precision = precision
             self.model = YOLO(model_path)
             logger.info(f"YOLO detector loaded successfully: {model_path}")
         except Exception as e:
             logger.error(f"Failed to load YOLO model {model_path}: {e}", exc_info=True)
             raise
         self.model.fuse()  # Fuse model for faster inference
+        if precision == "bf16":
+            self._enable_bf16()
+        # The Ultralytics predictor keeps per-call state, so a detector shared
+        # between streams must not run concurrently
+        self._lock = threading.Lock()
+    
+    def _enable_bf16(self):
+        """Run the network under bf16 autocast in channels_last, returning float32 outputs for NMS."""
+        module = self.model.model
+        module.to(memory_format=torch.channels_last)
+        forward = module.forward
+        
+        def to_float(out):
+            if isinstance(out, torch.Tensor):
+                return out.float()
+            if isinstance(out, (list, tuple)):
+                return type(out)(to_float(o) for o in out)
+            return out
+        
+        def bf16_forward(x, *args, **kwargs):
+            x = x.contiguous(memory_format=torch.channels_last)
+            with torch.autocast(device_type="cpu", dtype=torch.bfloat16):
+                return to_float(forward(x, *args, **kwargs))
+        
+        module.forward = bf16_forward
     
-    def infer(self, image: np.ndarray) -> List[Box]:
+    def infer(self, image: np.ndarray, conf_threshold: Optional[float] = None) -> BoxArray:
         """
         Run inference on image.
         
         Args:
             image: BGR image (numpy array)
+            conf_threshold: Per-call confidence threshold (defaults to the detector's)
             
         Returns:
-            List of detected boxes (person class only)
+            Detected boxes (person class only)
         """
+        conf = conf_threshold if conf_threshold is not None else self.conf_threshold
         try:
             # Run inference
-            results = self.model(image, conf=self.conf_threshold, imgsz=self.img_size, verbose=False)
+            with self._lock:
+                results = self.model(image, conf=conf, imgsz=self.img_size, verbose=False)
             
-            boxes = []
+            boxes = BoxArray()
             if results and len(results) > 0:
-                result = results[0]
-                boxes_tensor = result.boxes
-                
-                for i in range(len(boxes_tensor)):
-                    # Get box coordinates
-                    box = boxes_tensor.xyxy[i].cpu().numpy()
-                    conf = float(boxes_tensor.conf[i].cpu().numpy())
-                    cls = int(boxes_tensor.cls[i].cpu().numpy())
-                    
-                    # Only return person class (class 0)
-                    if cls == 0:
-                        boxes.append(Box(
-                            x1=float(box[0]),
-                            y1=float(box[1]),
-                            x2=float(box[2]),
-                            y2=float(box[3]),
-                            conf=conf,
-                            cls=cls
-                        ))
+                boxes = self._extract_boxes(results[0])
             
             logger.debug(f"YOLO detected {len(boxes)} persons")
             return boxes
         except Exception as e:
             logger.error(f"YOLO inference error: {e}", exc_info=True)
-            return []
+            return BoxArray()
+    
+    def infer_batch(self, images: List[np.ndarray], conf_threshold: Optional[float] = None) -> List[BoxArray]:
+        """
+        Run a single batched forward pass over several images.
+        
+        Args:
+            images: BGR images (numpy arrays)
+            conf_threshold: Per-call confidence threshold (defaults to the detector's)
+            
+        Returns:
+            Detected boxes per image (person class only)
+        """
+        conf = conf_threshold if conf_threshold is not None else self.conf_threshold
+        try:
+            with self._lock:
+                results = self.model(images, conf=conf, imgsz=self.img_size, verbose=False)
+            batch_boxes = [self._extract_boxes(result) for result in results]
+            logger.debug(f"YOLO batch of {len(images)} detected {sum(len(b) for b in batch_boxes)} persons")
+            return batch_boxes
+        except Exception as e:
+            logger.error(f"YOLO batch inference error: {e}", exc_info=True)
+            return [BoxArray() for _ in images]
+    
+    def _extract_boxes(self, result) -> BoxArray:
+        """Extract person boxes from a single Ultralytics result."""
+        # (N, 6+) tensor: x1, y1, x2, y2, [track id,] conf, cls
+        data = result.boxes.data
+        if len(data) == 0:
+            return BoxArray()
+        
+        # Only keep person class (class 0); filter on device, then a single transfer
+        data = data[data[:, -1] == 0]
+        data = data[:, [0, 1, 2, 3, -2, -1]]
+        return BoxArray(data.float().cpu().numpy())
     
-    def boxes_to_heatmap(self, image_shape: Tuple[int, int], boxes: List[Box]) -> np.ndarray:
+    def boxes_to_heatmap(self, image_shape: Tuple[int, int], boxes: BoxArray) -> np.ndarray:
         """
         Convert bounding boxes to a density-like heatmap.
         
         Args:
             image_shape: (height, width) of original image
-            boxes: List of detected boxes
+            boxes: Detected boxes
             
         Returns:
             Density map (H, W) with Gaussian kernels at box centers
         """
         h, w = image_shape
         heatmap = np.zeros((h, w), dtype=np.float32)
+        if len(boxes) == 0:
+            return heatmap
         
-        for box in boxes:
-            # Box center
-            cx = int((box.x1 + box.x2) / 2)
-            cy = int((box.y1 + box.y2) / 2)
-            
-            # Box size
-            box_w = box.x2 - box.x1
-            box_h = box.y2 - box.y1
-            radius = max(int(min(box_w, box_h) / 2), 3)
-            
-            # Draw Gaussian kernel
-            cv2.circle(heatmap, (cx, cy), radius, 1.0, -1)
+        # Box centers and radii for all boxes at once
+        cx, cy = boxes.centers()
+        box_w = boxes.x2 - boxes.x1
+        box_h = boxes.y2 - boxes.y1
+        radius = np.maximum((np.minimum(box_w, box_h) / 2).astype(np.int32), 3)
+        
+        # Draw Gaussian kernel
+        for x, y, r in zip(cx.tolist(), cy.tolist(), radius.tolist()):
+            cv2.circle(heatmap, (x, y), r, 1.0, -1)
         
         # Normalize
         if heatmap.max() > 0:
             heatmap = heatmap / heatmap.max()
         
         return heatmap
-
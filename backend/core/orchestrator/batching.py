@@ -0,0 +1,185 @@
+"""Cross-stream dynamic batching for model inference."""
+import time
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from queue import Queue, Empty
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from core.metrics.prometheus import record_batch
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Request:
+    """A single frame waiting to be batched."""
+    image: np.ndarray
+    future: Future
+    options: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class _Lane:
+    """Queue and batching thread for one model instance."""
+
+    def __init__(self, name: str, model: Any, max_batch_size: int, max_wait_s: float):
+        self.name = name
+        self.model = model
+        self.refcount = 0
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.queue: "Queue[_Request]" = Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self.thread.start()
+
+    def _collect(self) -> Optional[List[_Request]]:
+        """Wait for a first request, then gather more until full or the deadline passes."""
+        try:
+            first = self.queue.get(timeout=0.5)
+        except Empty:
+            return None
+
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Batching loop."""
+        while self.running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Frames can only be stacked with frames of the same shape and options
+            groups: Dict[tuple, List[_Request]] = {}
+            for request in batch:
+                group_key = (request.image.shape, tuple(sorted(request.options.items())))
+                groups.setdefault(group_key, []).append(request)
+
+            for requests in groups.values():
+                started = time.monotonic()
+                record_batch(
+                    self.name,
+                    len(requests),
+                    [(started - r.enqueued_at) * 1000 for r in requests],
+                    self.queue.qsize()
+                )
+                try:
+                    outputs = self.model.infer_batch([r.image for r in requests], **requests[0].options)
+                    for request, output in zip(requests, outputs):
+                        request.future.set_result(output)
+                except Exception as e:
+                    logger.error(f"Batched inference failed for {self.name}: {e}", exc_info=True)
+                    for request in requests:
+                        request.future.set_exception(e)
+
+        # Fail anything still queued so callers don't hang
+        while True:
+            try:
+                self.queue.get_nowait().future.set_exception(RuntimeError("Batch scheduler stopped"))
+            except Empty:
+                break
+
+    def submit(self, image: np.ndarray, options: Dict[str, Any]) -> Future:
+        """Queue a frame and return a future for its result."""
+        future: Future = Future()
+        self.queue.put(_Request(image=image, future=future, options=options))
+        return future
+
+    def stop(self):
+        """Stop the batching thread."""
+        self.running = False
+        self.thread.join(timeout=2.0)
+
+
+class BatchedModel:
+    """
+    Drop-in proxy for a model that routes infer() through a batch lane.
+
+    Every other attribute (e.g. boxes_to_heatmap) is delegated to the
+    underlying model, so the pipeline does not need to know about batching.
+    """
+
+    def __init__(self, lane: _Lane):
+        self._lane = lane
+
+    def infer(self, image: np.ndarray, **options):
+        """Run inference on image, blocking until its batch has been processed."""
+        return self._lane.submit(image, options).result()
+
+    def __getattr__(self, name: str):
+        return getattr(self._lane.model, name)
+
+
+class BatchScheduler:
+    """
+    Collect frames from all streams and run batched forward passes.
+
+    Streams that use the same model configuration share one lane. Each lane
+    waits at most max_wait_ms after the first queued frame before running
+    whatever it has collected (up to max_batch_size frames).
+    """
+
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 15.0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._lock = threading.Lock()
+
+    def model(self, key: Hashable, name: str, model: Any) -> BatchedModel:
+        """
+        Get a batched proxy for a model, starting its lane on first use.
+
+        Args:
+            key: Model identity (see ModelKey)
+            name: Label used in logs and metrics
+            model: Loaded model providing infer_batch
+
+        Returns:
+            BatchedModel proxy sharing the lane for this key (call release() when done)
+        """
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = _Lane(name, model, self.max_batch_size, self.max_wait_s)
+                self._lanes[key] = lane
+                logger.info(
+                    f"Batch lane started: {name} "
+                    f"(max_batch={self.max_batch_size}, max_wait={self.max_wait_s * 1000:.0f}ms)"
+                )
+            lane.refcount += 1
+        return BatchedModel(lane)
+
+    def release(self, key: Hashable):
+        """Drop a reference to a lane, stopping it when no stream uses it."""
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                return
+            lane.refcount -= 1
+            if lane.refcount > 0:
+                return
+            del self._lanes[key]
+        lane.stop()
+        logger.info(f"Batch lane stopped: {lane.name}")
+
+    def shutdown(self):
+        """Stop all batching threads."""
+        with self._lock:
+            lanes = list(self._lanes.values())
+            self._lanes.clear()
+        for lane in lanes:
+            lane.stop()
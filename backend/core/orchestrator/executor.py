@@ -0,0 +1,448 @@
+"""Execution backends for running inference pipelines off the event loop."""
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from core.orchestrator.batching import BatchScheduler
+from core.orchestrator.pipeline import InferencePipeline
+from core.models.yolo import YoloDetector
+from core.models.csrnet import CSRNetInference
+from core.ingestion.file import read_sample_frames
+from core.ingestion.frame import Frame, PlanarFrame, frame_bgr
+from core.models.export import artifact_path
+from core.models.registry import ModelKey, model_registry
+from core.postprocess.heatmap import density_to_heatmap_png, frame_to_jpeg
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bounding box of live thumbnails (dashboard cards)
+THUMBNAIL_MAX_WIDTH = 320
+THUMBNAIL_MAX_HEIGHT = 180
+THUMBNAIL_QUALITY = 70
+
+# Long side planar frames are converted at for the live preview (frame_to_jpeg fits it to 1920x1080)
+PREVIEW_MAX_SIDE = 1920
+
+
+@dataclass
+class PipelineOptions:
+    """Process-wide settings used when building pipelines."""
+    csrnet_model_path: Optional[str] = None
+    ema_alpha: float = 0.7
+    model_dir: str = "./models"  # Exported ONNX artifacts
+    onnx_intra_op_threads: int = 0  # 0 = ONNX Runtime default
+    onnx_inter_op_threads: int = 1
+    calibration_clip: Optional[str] = None  # Video used to calibrate int8 PyTorch models
+    calibration_frames: int = 32
+
+
+def _load_yolo(model_name: str, imgsz: int, runtime: str, precision: str, options: PipelineOptions):
+    """Load a YOLO detector for the given runtime and precision."""
+    if runtime == "onnx":
+        from core.models.onnx_runtime import YoloOnnxDetector
+        if precision == "bf16":
+            raise ValueError("bf16 is not supported by the onnx runtime")
+        return YoloOnnxDetector(
+            model_path=str(artifact_path(options.model_dir, "yolo", model_name, imgsz, precision=precision)),
+            img_size=imgsz,
+            intra_op_threads=options.onnx_intra_op_threads,
+            inter_op_threads=options.onnx_inter_op_threads,
+        )
+    return YoloDetector(model_path=model_name, img_size=imgsz, precision=precision)
+
+
+def _load_csrnet(weights: Optional[str], input_size: int, runtime: str, precision: str, options: PipelineOptions):
+    """Load CSRNet for the given runtime and precision."""
+    if runtime == "onnx":
+        from core.models.onnx_runtime import CSRNetOnnxInference
+        if precision == "bf16":
+            raise ValueError("bf16 is not supported by the onnx runtime")
+        return CSRNetOnnxInference(
+            model_path=str(artifact_path(options.model_dir, "csrnet", weights, input_size, precision=precision)),
+            input_size=input_size,
+            intra_op_threads=options.onnx_intra_op_threads,
+            inter_op_threads=options.onnx_inter_op_threads,
+        )
+
+    calibration_frames = None
+    if precision == "int8":
+        if not options.calibration_clip:
+            raise ValueError("int8 CSRNet requires QUANT_CALIBRATION_CLIP for calibration")
+        calibration_frames = read_sample_frames(options.calibration_clip, options.calibration_frames)
+    return CSRNetInference(
+        model_path=weights,
+        input_size=input_size,
+        precision=precision,
+        calibration_frames=calibration_frames,
+    )
+
+
+def build_pipeline(
+    stream_id: str,
+    config: Dict[str, Any],
+    options: PipelineOptions,
+    scheduler: Optional[BatchScheduler] = None,
+) -> Tuple[InferencePipeline, List[ModelKey]]:
+    """
+    Acquire shared models and build the inference pipeline for a stream.
+
+    Args:
+        stream_id: Stream identifier (used for logging)
+        config: Stream config with 'inference' and 'zones'
+        options: Model locations and runtime settings
+        scheduler: If given, models are wrapped in batched proxies from this scheduler
+
+    Returns:
+        (pipeline, model keys to pass to release_models when the stream stops)
+    """
+    inference_config = config.get("inference", {})
+    mode = inference_config.get("mode", "hybrid")
+    runtime = inference_config.get("runtime") or "torch"
+    logger.info(f"[{stream_id}] Inference mode: {mode}, runtime: {runtime}")
+
+    yolo = None
+    csrnet = None
+    detector_conf = None
+    keys: List[ModelKey] = []
+
+    def acquire(key: ModelKey, factory):
+        model = model_registry.acquire(key, factory)
+        keys.append(key)
+        if scheduler is not None:
+            return scheduler.model(key, f"{key.kind}:{key.name}", model)
+        return model
+
+    try:
+        if mode in ["detector", "hybrid"]:
+            detector_cfg = inference_config.get("detector") or {}
+            model_name = detector_cfg.get("model", "yolov8n")
+            imgsz = detector_cfg.get("imgsz", 960)
+            precision = detector_cfg.get("precision", "fp32")
+            detector_conf = detector_cfg.get("conf", 0.25)
+            logger.info(f"[{stream_id}] Loading YOLO model: {model_name} ({precision})")
+            yolo = acquire(
+                ModelKey("yolo", model_name, imgsz, precision=precision, runtime=runtime),
+                partial(_load_yolo, model_name, imgsz, runtime, precision, options)
+            )
+            logger.info(f"[{stream_id}] YOLO model loaded successfully")
+    except Exception as e:
+        logger.error(f"[{stream_id}] Failed to load YOLO model: {e}", exc_info=True)
+        if mode == "detector":
+            release_models(keys, scheduler)
+            raise  # Fail if detector is required
+
+    try:
+        if mode in ["density", "hybrid"]:
+            density_cfg = inference_config.get("density") or {}
+            input_size = density_cfg.get("input_size", 768)
+            precision = density_cfg.get("precision", "fp32")
+            logger.info(f"[{stream_id}] Loading CSRNet model ({precision})...")
+            weights = options.csrnet_model_path
+            if not (weights and Path(weights).exists()):
+                weights = None  # Untrained model
+            csrnet = acquire(
+                ModelKey("csrnet", weights or "stub", input_size, precision=precision, runtime=runtime),
+                partial(_load_csrnet, weights, input_size, runtime, precision, options)
+            )
+            logger.info(f"[{stream_id}] CSRNet model loaded successfully")
+    except Exception as e:
+        logger.warning(f"[{stream_id}] Failed to load CSRNet model: {e}", exc_info=True)
+        if mode == "density":
+            logger.error(f"[{stream_id}] Density mode requires CSRNet - failing")
+            release_models(keys, scheduler)
+            raise
+
+    zones = config.get("zones", [])
+    heatmap_cfg = (config.get("output") or {}).get("heatmap") or {}
+    logger.info(f"[{stream_id}] Initializing pipeline with {len(zones)} zones")
+    pipeline = InferencePipeline(
+        yolo_detector=yolo,
+        csrnet=csrnet,
+        ema_alpha=options.ema_alpha,
+        zones=zones,
+        detector_conf=detector_conf,
+        heatmap_full_resolution=bool(heatmap_cfg.get("full_resolution", False)),
+    )
+    return pipeline, keys
+
+
+def release_models(keys: List[ModelKey], scheduler: Optional[BatchScheduler] = None):
+    """Release models acquired by build_pipeline."""
+    for key in keys:
+        if scheduler is not None:
+            scheduler.release(key)
+        model_registry.release(key)
+
+
+def run_pipeline(
+    pipeline: InferencePipeline,
+    image: Frame,
+    inference_mode: str = "hybrid",
+    encode_frame: bool = False,
+    encode_heatmap: bool = True,
+    encode_thumbnail: bool = False,
+    captured_at: Optional[float] = None,
+    source_shape: Optional[Tuple[int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Process a frame and encode the heatmap/preview/thumbnail images.
+    
+    Encoding is skipped (and the result's images are None) unless requested;
+    streams nobody is watching only need counts and zones.
+
+    All CPU-heavy per-frame work (inference, PNG and JPEG encoding) happens
+    here so it can run in a worker thread or process. Large arrays are dropped
+    from the returned result so it stays cheap to pickle. Heatmaps are encoded
+    at density map resolution (the dashboard scales them onto the frame)
+    unless the stream asks for full-resolution heatmaps.
+
+    Returns:
+        Pipeline result plus "fps", "heatmap" (PNG bytes or None),
+        "frame" and "thumbnail" (JPEG bytes or None)
+    """
+    result = pipeline.process_frame(
+        image, inference_mode=inference_mode, render_heatmap=encode_heatmap,
+        captured_at=captured_at, source_shape=source_shape
+    )
+
+    heatmap_data = None
+    density_map = result.pop("density_map", None)
+    if density_map is not None and encode_heatmap:
+        size = density_map.frame_shape if pipeline.heatmap_full_resolution else None
+        heatmap_data = density_to_heatmap_png(density_map.data, colormap="JET", size=size)
+    result.pop("boxes", None)
+
+    result["fps"] = pipeline.last_fps
+    result["heatmap"] = heatmap_data
+    result["frame"] = frame_to_jpeg(frame_bgr(image, PREVIEW_MAX_SIDE)) if encode_frame else None
+    result["thumbnail"] = frame_to_jpeg(
+        frame_bgr(image, THUMBNAIL_MAX_WIDTH), THUMBNAIL_MAX_WIDTH, THUMBNAIL_MAX_HEIGHT, THUMBNAIL_QUALITY
+    ) if encode_thumbnail else None
+    return result
+
+
+# Pipelines owned by the current worker process (process backend only)
+_process_pipelines: Dict[str, Tuple[InferencePipeline, List[ModelKey]]] = {}
+
+
+def _init_process_worker(num_threads: int, max_idle_models: int):
+    """Limit torch/cv2 threads so worker processes don't oversubscribe cores."""
+    import cv2
+    import torch
+    torch.set_num_threads(num_threads)
+    cv2.setNumThreads(num_threads)
+    model_registry.max_idle = max_idle_models
+
+
+def _process_register(stream_id: str, config: Dict[str, Any], options: PipelineOptions):
+    """Build a pipeline inside the worker process."""
+    _process_pipelines[stream_id] = build_pipeline(stream_id, config, options)
+
+
+def _process_run(
+    stream_id: str,
+    image: np.ndarray,
+    inference_mode: str,
+    encode_frame: bool,
+    encode_heatmap: bool,
+    encode_thumbnail: bool,
+    captured_at: Optional[float],
+    source_shape: Optional[Tuple[int, int]],
+) -> Dict[str, Any]:
+    """Run a frame through a pipeline owned by the worker process."""
+    pipeline, _ = _process_pipelines[stream_id]
+    return run_pipeline(
+        pipeline, image, inference_mode, encode_frame, encode_heatmap, encode_thumbnail, captured_at, source_shape
+    )
+
+
+def _process_unregister(stream_id: str):
+    """Drop a pipeline and release its models in the worker process."""
+    entry = _process_pipelines.pop(stream_id, None)
+    if entry is not None:
+        release_models(entry[1])
+
+
+def _process_list_models() -> List[Dict[str, Any]]:
+    """List models loaded in the worker process."""
+    return model_registry.list_models()
+
+
+class PipelineExecutor:
+    """
+    Run per-stream inference pipelines in a thread or process pool.
+
+    - "thread": pipelines live in this process and run on a shared thread pool.
+      torch and cv2 release the GIL, so streams run in parallel.
+    - "process": each stream is pinned to one single-worker process that owns
+      its own model instances. Frames of a stream always go to the same process
+      so EMA/hysteresis state stays consistent.
+
+    Streams that use the same model configuration share one instance from the
+    model registry. With a BatchScheduler (thread backend only) their frames
+    are also batched together. Each frame waiting for its batch holds a pool
+    thread, so the pool is grown to at least the scheduler's max batch size.
+    """
+
+    def __init__(
+        self,
+        backend: str = "thread",
+        max_workers: int = 4,
+        options: Optional[PipelineOptions] = None,
+        scheduler: Optional[BatchScheduler] = None,
+        max_idle_models: int = 2,
+    ):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        if scheduler is not None and backend != "thread":
+            raise ValueError("Batched inference requires the thread backend")
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        if scheduler is not None and self.max_workers < scheduler.max_batch_size:
+            logger.info(
+                f"Inference threads raised from {self.max_workers} to {scheduler.max_batch_size} "
+                f"so batches can fill up"
+            )
+            self.max_workers = scheduler.max_batch_size
+        self.options = options or PipelineOptions()
+        self.scheduler = scheduler
+
+        self._pipelines: Dict[str, Tuple[InferencePipeline, List[ModelKey]]] = {}
+        self._assignments: Dict[str, int] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pools: list = []
+
+        if backend == "thread":
+            model_registry.max_idle = max_idle_models
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        else:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.max_workers)
+            ctx = get_context("spawn")
+            self._process_pools = [
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=ctx,
+                    initializer=_init_process_worker,
+                    initargs=(threads_per_worker, max_idle_models)
+                )
+                for _ in range(self.max_workers)
+            ]
+        logger.info(f"Pipeline executor started: backend={backend}, workers={self.max_workers}")
+
+    def _pool_for(self, stream_id: str) -> Executor:
+        """Get the executor that runs a stream's frames."""
+        if self._thread_pool is not None:
+            return self._thread_pool
+        return self._process_pools[self._assignments[stream_id]]
+
+    async def register(self, stream_id: str, config: Dict[str, Any]):
+        """Load models and create the pipeline for a stream."""
+        loop = asyncio.get_running_loop()
+        if self.backend == "thread":
+            self._pipelines[stream_id] = await loop.run_in_executor(
+                self._thread_pool, build_pipeline,
+                stream_id, config, self.options, self.scheduler
+            )
+        else:
+            # Pin the stream to the least loaded worker process
+            loads = [0] * len(self._process_pools)
+            for idx in self._assignments.values():
+                loads[idx] += 1
+            self._assignments[stream_id] = loads.index(min(loads))
+            try:
+                await loop.run_in_executor(
+                    self._pool_for(stream_id), _process_register,
+                    stream_id, config, self.options
+                )
+            except Exception:
+                del self._assignments[stream_id]
+                raise
+            logger.info(f"[{stream_id}] Pipeline assigned to worker process {self._assignments[stream_id]}")
+
+    async def process(
+        self,
+        stream_id: str,
+        image: Frame,
+        inference_mode: str = "hybrid",
+        encode_frame: bool = False,
+        encode_heatmap: bool = True,
+        encode_thumbnail: bool = False,
+        captured_at: Optional[float] = None,
+        source_shape: Optional[Tuple[int, int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Process a frame for a stream without blocking the event loop.
+
+        captured_at is the frame's time.monotonic() capture time; the clock is
+        system-wide, so ages are also right in worker processes. source_shape
+        is the source (H, W) of a frame scaled to a working size. Planar
+        frames can't be pickled and are converted to BGR before they are
+        sent to a worker process.
+        """
+        loop = asyncio.get_running_loop()
+        if self.backend == "thread":
+            pipeline, _ = self._pipelines[stream_id]
+            return await loop.run_in_executor(
+                self._thread_pool, run_pipeline,
+                pipeline, image, inference_mode, encode_frame, encode_heatmap, encode_thumbnail,
+                captured_at, source_shape
+            )
+        if isinstance(image, PlanarFrame):
+            image = image.bgr()
+        return await loop.run_in_executor(
+            self._pool_for(stream_id), _process_run,
+            stream_id, image, inference_mode, encode_frame, encode_heatmap, encode_thumbnail,
+            captured_at, source_shape
+        )
+
+    async def unregister(self, stream_id: str):
+        """Release the pipeline for a stream."""
+        if self.backend == "thread":
+            entry = self._pipelines.pop(stream_id, None)
+            if entry is not None:
+                release_models(entry[1], self.scheduler)
+            return
+        if stream_id not in self._assignments:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._pool_for(stream_id), _process_unregister, stream_id)
+        except Exception as e:
+            logger.warning(f"[{stream_id}] Failed to release pipeline in worker process: {e}")
+        finally:
+            del self._assignments[stream_id]
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """Describe loaded models across all workers."""
+        if self.backend == "thread":
+            return model_registry.list_models()
+        loop = asyncio.get_running_loop()
+        models = []
+        for idx, pool in enumerate(self._process_pools):
+            for info in await loop.run_in_executor(pool, _process_list_models):
+                models.append({**info, "worker": idx})
+        return models
+
+    def shutdown(self):
+        """Shut down worker threads/processes."""
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+        for pool in self._process_pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pipelines.clear()
+        self._assignments.clear()
+        model_registry.clear()
+        logger.info("Pipeline executor shut down")
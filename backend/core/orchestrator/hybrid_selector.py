@@ -9,8 +9,11 @@ def scene_score(image: np.ndarray) -> float:
     Compute scene complexity score using Laplacian variance.
     Higher values indicate more texture/detail (good for detector).
     Lower values indicate smoother scenes (good for density model).
+    
+    Accepts a BGR image or an already grayscale (H, W) one, such as a
+    decoder's luma plane.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
     return float(laplacian_var)
 
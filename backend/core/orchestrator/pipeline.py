@@ -3,9 +3,10 @@ import numpy as np
 from typing import Tuple, Optional, List, Dict, Any
 import time
 
+from core.ingestion.frame import Frame, frame_bgr, frame_luma
 from core.orchestrator.hybrid_selector import HybridSelector
-from core.models.yolo import YoloDetector
-from core.models.csrnet import CSRNetInference
+from core.models.yolo import YoloDetector, BoxArray
+from core.models.csrnet import CSRNetInference, DensityMap
 from core.postprocess.smoothing import EMA
 from core.postprocess.zones import ZoneManager
 
@@ -20,9 +21,13 @@ class InferencePipeline:
         hybrid_selector: Optional[HybridSelector] = None,
         ema_alpha: float = 0.7,
         zones: Optional[List[Dict[str, Any]]] = None,
+        detector_conf: Optional[float] = None,
+        heatmap_full_resolution: bool = False,
     ):
         self.yolo = yolo_detector
         self.csrnet = csrnet
+        self.detector_conf = detector_conf  # Per-stream threshold for a shared detector
+        self.heatmap_full_resolution = heatmap_full_resolution  # Upsample heatmaps to frame size
         self.selector = hybrid_selector or HybridSelector()
         self.count_ema = EMA(alpha=ema_alpha)
         self.zone_manager = ZoneManager(zones) if zones else None
@@ -37,27 +42,41 @@ class InferencePipeline:
     
     def process_frame(
         self,
-        image: np.ndarray,
-        inference_mode: str = "hybrid"
+        image: Frame,
+        inference_mode: str = "hybrid",
+        render_heatmap: bool = True,
+        captured_at: Optional[float] = None,
+        source_shape: Optional[Tuple[int, int]] = None
     ) -> Dict[str, Any]:
         """
         Process a single frame and return results.
         
+        With render_heatmap=False the detector's display heatmap is skipped
+        (density_map is None in detector mode); counts and zones are unaffected.
+        The image is a BGR array or a PlanarFrame; planar frames are scored
+        on their luma plane and converted to BGR at the chosen model's input
+        size, with boxes and density maps mapped back to frame pixels. Frame
+        pixels are those of source_shape (H, W) when the image was scaled to
+        a working size at ingestion, so zone polygons keep their meaning.
+        With captured_at (time.monotonic() when the frame was captured) the
+        result includes the frame's age once processed.
+        
         Returns:
             {
                 "count": int,
-                "density_map": Optional[np.ndarray],
-                "boxes": Optional[List[Box]],
+                "density_map": Optional[DensityMap],
+                "boxes": Optional[BoxArray],
                 "model_used": str,
                 "zones": List[ZoneStats],
                 "latency_ms": float,
+                "frame_age_ms": Optional[float],
             }
         """
         start_time = time.time()
         
         # Choose model
         if inference_mode == "hybrid":
-            model_choice = self.selector.choose_model(image)
+            model_choice = self.selector.choose_model(frame_luma(image))
         elif inference_mode == "detector":
             model_choice = "detector"
         elif inference_mode == "density":
@@ -70,28 +89,21 @@ class InferencePipeline:
         density_map = None
         boxes = None
         
+        frame_shape = tuple(source_shape) if source_shape else image.shape[:2]
         if model_choice == "detector" and self.yolo:
-            boxes = self.yolo.infer(image)
-            raw_count = len([b for b in boxes if b.cls == 0])  # person class
-            # Convert boxes to density-like heatmap
-            density_map = self.yolo.boxes_to_heatmap(image.shape[:2], boxes)
+            pixels = frame_bgr(image, self.yolo.img_size)
+            boxes = self.yolo.infer(pixels, conf_threshold=self.detector_conf)
+            # Convert boxes to density-like heatmap (at the resolution the detector saw)
+            if render_heatmap:
+                density_map = DensityMap(self.yolo.boxes_to_heatmap(pixels.shape[:2], boxes), frame_shape)
+            if pixels.shape[:2] != frame_shape:
+                boxes.rescale(frame_shape[1] / pixels.shape[1], frame_shape[0] / pixels.shape[0])
+            raw_count = len(boxes)  # person class only
         elif model_choice == "density" and self.csrnet:
-            density_map = self.csrnet.infer(image)
-            raw_sum = density_map.sum()
-            # CSRNet stub might output very large values - scale down if needed
-            # For a properly trained CSRNet, sum should be close to actual count
-            # For stub model, we'll cap it at a reasonable value
-            if raw_sum > 1000:  # If sum is unrealistically large, scale it
-                # Estimate count based on density map max and area
-                max_density = density_map.max()
-                if max_density > 0:
-                    # Rough heuristic: if max density is very high, the model output needs scaling
-                    scale_factor = min(100.0 / max_density, 1.0)  # Scale down if max > 100
-                    raw_count = int(raw_sum * scale_factor)
-                else:
-                    raw_count = 0
-            else:
-                raw_count = int(raw_sum)
+            density_map = self.csrnet.infer(frame_bgr(image, self.csrnet.input_size))
+            if density_map.frame_shape != frame_shape:
+                density_map = DensityMap(density_map.data, frame_shape)
+            raw_count = int(round(density_map.sum()))
         
         # Apply EMA smoothing (for display stability)
         smoothed_count = self.count_ema.update(raw_count)
@@ -106,7 +118,7 @@ class InferencePipeline:
             zone_stats = self.zone_manager.compute_stats(
                 density_map=density_map,
                 boxes=boxes,
-                image_shape=image.shape[:2]
+                image_shape=frame_shape
             )
         
         # Update stats
@@ -130,6 +142,7 @@ class InferencePipeline:
             "model_used": model_choice,
             "zones": zone_stats,
             "latency_ms": latency_ms,
+            "frame_age_ms": (time.monotonic() - captured_at) * 1000 if captured_at is not None else None,
         }
     
     def get_stats(self) -> Dict[str, Any]:
@@ -1,26 +1,24 @@
 """Heatmap rendering utilities."""
 import cv2
 import numpy as np
-import base64
-from io import BytesIO
-from typing import Optional
+from typing import Optional, Tuple
 
 
-def density_to_heatmap_image(
+def density_to_heatmap_png(
     density_map: np.ndarray,
     colormap: str = "JET",
-    alpha: float = 0.55
-) -> str:
+    size: Optional[Tuple[int, int]] = None
+) -> bytes:
     """
-    Convert density map to base64-encoded PNG image.
+    Convert density map to a colored PNG image.
     
     Args:
         density_map: Density map (H, W)
         colormap: Colormap name (JET, VIRIDIS, etc.)
-        alpha: Alpha blending factor (not used in this function, kept for compatibility)
+        size: (H, W) to upsample to before coloring (defaults to the map's own size)
         
     Returns:
-        Base64-encoded PNG image data URL
+        PNG bytes
     """
     # Normalize to 0-1
     if density_map.max() > 0:
@@ -31,6 +29,10 @@ def density_to_heatmap_image(
     # Convert to 0-255
     normalized = (normalized * 255).astype(np.uint8)
     
+    # Upsample the 8-bit image rather than the float density map
+    if size is not None and tuple(size) != normalized.shape:
+        normalized = cv2.resize(normalized, (size[1], size[0]), interpolation=cv2.INTER_LINEAR)
+    
     # Apply colormap
     colormap_code = getattr(cv2, f"COLORMAP_{colormap}", cv2.COLORMAP_JET)
     heatmap = cv2.applyColorMap(normalized, colormap_code)
@@ -40,7 +42,35 @@ def density_to_heatmap_image(
     
     # Encode to PNG
     _, buffer = cv2.imencode('.png', heatmap_rgb)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
+    return buffer.tobytes()
+
+
+def frame_to_jpeg(
+    frame: np.ndarray,
+    max_width: int = 1920,
+    max_height: int = 1080,
+    quality: int = 85
+) -> bytes:
+    """
+    Encode a BGR frame as JPEG.
+    
+    Args:
+        frame: BGR image (H, W, 3)
+        max_width: Frames wider than this are downscaled
+        max_height: Frames taller than this are downscaled
+        quality: JPEG quality (0-100)
+        
+    Returns:
+        JPEG bytes
+    """
+    # Resize frame if too large
+    h, w = frame.shape[:2]
+    if w > max_width or h > max_height:
+        scale = min(max_width / w, max_height / h)
+        new_w, new_h = int(w * scale), int(h * scale)
+        frame = cv2.resize(frame, (new_w, new_h))
     
-    return f"data:image/png;base64,{img_base64}"
+    # Encode frame as JPEG (smaller than PNG)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
 
@@ -2,10 +2,52 @@
 import numpy as np
 import cv2
 from typing import List, Dict, Any, Optional, Tuple
-from shapely.geometry import Polygon, Point
 from dataclasses import dataclass
 
 
+# Sub-samples per cell side used to estimate fractional cell coverage
+COVERAGE_SUPERSAMPLE = 8
+
+
+def polygon_coverage(
+    polygon: List[List[float]],
+    grid_shape: Tuple[int, int],
+    scale: Tuple[float, float],
+    supersample: int = COVERAGE_SUPERSAMPLE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fraction of each grid cell covered by a polygon.
+    
+    Args:
+        polygon: List of [x, y] points in frame pixels
+        grid_shape: (rows, cols) of the grid
+        scale: (sx, sy) frame pixels per cell
+        supersample: Sub-samples per cell side
+        
+    Returns:
+        (flat cell indices, coverage in (0, 1]) for cells touched by the polygon
+    """
+    rows, cols = grid_shape
+    pts = np.array(polygon, dtype=np.float64) / np.array(scale, dtype=np.float64)
+    
+    # Only rasterize the polygon's bounding box
+    x0, y0 = np.maximum(np.floor(pts.min(axis=0)).astype(int), 0)
+    x1 = min(int(np.ceil(pts[:, 0].max())), cols)
+    y1 = min(int(np.ceil(pts[:, 1].max())), rows)
+    if x1 <= x0 or y1 <= y0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    
+    # Sub-sample (m, n) of the box is centered at ((n + 0.5) / k, (m + 0.5) / k) cells
+    k = supersample
+    fine = np.zeros(((y1 - y0) * k, (x1 - x0) * k), dtype=np.uint8)
+    fine_pts = (pts - (x0, y0)) * k - 0.5
+    cv2.fillPoly(fine, [np.round(fine_pts * 16).astype(np.int32)], 1, shift=4)
+    coverage = fine.reshape(y1 - y0, k, x1 - x0, k).sum(axis=(1, 3), dtype=np.float32) / (k * k)
+    
+    ys, xs = np.nonzero(coverage)
+    return (ys + y0).astype(np.int64) * cols + xs + x0, coverage[ys, xs]
+
+
 @dataclass
 class ZoneStats:
     """Zone statistics."""
@@ -17,111 +59,159 @@ class ZoneStats:
 class ZoneManager:
     """Manage zones and compute zone-based counts."""
     
-    def __init__(self, zones: Optional[List[Dict[str, Any]]] = None):
+    def __init__(self, zones: Optional[List[Dict[str, Any]]] = None, box_anchor: str = "center"):
         """
         Initialize zone manager.
         
         Args:
             zones: List of zone configs with 'id', 'name', 'polygon', 'threshold'
+            box_anchor: Point of a box that decides its zone: "center" or "foot" (bottom center)
         """
+        if box_anchor not in ("center", "foot"):
+            raise ValueError(f"Unknown box anchor: {box_anchor}")
         self.zones = zones or []
-        self.masks: Dict[str, np.ndarray] = {}
-        self.polygons: Dict[str, Polygon] = {}
+        self.box_anchor = box_anchor
+        # Zone-set id per frame pixel; zone_sets[id] is that set's membership row
+        self.label_map: Optional[np.ndarray] = None
+        self.zone_sets: Optional[np.ndarray] = None
+        # Sparse zone coverage of the density map grid, rebuilt if the map shape changes
+        self._matrix_rows = self._matrix_cells = self._matrix_weights = None
+        self._density_key: Optional[Tuple] = None
     
-    def create_mask(self, zone_id: str, polygon: List[List[float]], image_shape: Tuple[int, int]) -> np.ndarray:
+    def setup_zones(self, image_shape: Tuple[int, int]):
         """
-        Create binary mask for zone polygon.
+        Build the zone label map for given image shape.
         
-        Args:
-            zone_id: Zone identifier
-            polygon: List of [x, y] points
-            image_shape: (height, width) of image
-            
-        Returns:
-            Binary mask (H, W)
+        Every pixel stores the id of the set of zones containing it (0 = no
+        zone), so overlapping zones need no extra masks. zone_sets is the
+        (sets x zones) membership matrix for those ids.
         """
         h, w = image_shape
-        mask = np.zeros((h, w), dtype=np.uint8)
+        label_map = np.zeros((h, w), dtype=np.int32)
+        masks = [0]  # Zone bitmask of each set id
+        index = {0: 0}
         
-        # Convert polygon to integer points
-        pts = np.array(polygon, dtype=np.int32)
+        for z, zone in enumerate(self.zones):
+            pts = np.array(zone["polygon"], dtype=np.int32)
+            x0, y0 = np.maximum(pts.min(axis=0), 0)
+            x1, y1 = np.minimum(pts.max(axis=0) + 1, (w, h))
+            if x1 <= x0 or y1 <= y0:
+                continue
+            
+            # Rasterize within the bounding box only
+            inside = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.fillPoly(inside, [pts], 1, offset=(-int(x0), -int(y0)))
+            inside = inside.view(bool)
+            region = label_map[y0:y1, x0:x1]
+            
+            # Add this zone to every set it overlaps
+            old_ids, inverse = np.unique(region[inside], return_inverse=True)
+            new_ids = np.empty_like(old_ids)
+            for j, old_id in enumerate(old_ids.tolist()):
+                bits = masks[old_id] | (1 << z)
+                if bits not in index:
+                    index[bits] = len(masks)
+                    masks.append(bits)
+                new_ids[j] = index[bits]
+            region[inside] = new_ids[inverse.reshape(-1)]
         
-        # Fill polygon
-        cv2.fillPoly(mask, [pts], 255)
+        zone_sets = np.zeros((len(masks), len(self.zones)), dtype=np.int32)
+        for set_id, bits in enumerate(masks):
+            for z in range(len(self.zones)):
+                if bits >> z & 1:
+                    zone_sets[set_id, z] = 1
         
-        return mask
+        if len(masks) <= np.iinfo(np.uint16).max + 1:
+            label_map = label_map.astype(np.uint16)
+        self.label_map = label_map
+        self.zone_sets = zone_sets
     
-    def setup_zones(self, image_shape: Tuple[int, int]):
-        """Setup zone masks for given image shape."""
-        self.masks = {}
-        self.polygons = {}
+    def compile_density_matrix(self, density_map: Any):
+        """
+        Compile all zones into a sparse (zones x cells) coverage matrix.
         
-        for zone in self.zones:
-            zone_id = zone["id"]
-            polygon_pts = zone["polygon"]
-            
-            # Create mask
-            mask = self.create_mask(zone_id, polygon_pts, image_shape)
-            self.masks[zone_id] = mask
+        Entry (z, c) is the fraction of density map cell c inside zone z, so
+        every zone count is one sparse mat-vec with the flattened map. The
+        matrix is stored in COO form (rows, cells, weights).
+        
+        Args:
+            density_map: DensityMap the matrix is built for
+        """
+        rows, cells, weights = [], [], []
+        for row, zone in enumerate(self.zones):
+            zone_cells, zone_weights = polygon_coverage(zone["polygon"], density_map.shape, density_map.scale)
+            rows.append(np.full(len(zone_cells), row, dtype=np.int32))
+            cells.append(zone_cells)
+            weights.append(zone_weights)
+        
+        self._matrix_rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+        self._matrix_cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+        self._matrix_weights = np.concatenate(weights) if weights else np.empty(0, dtype=np.float32)
+        self._density_key = (density_map.shape, density_map.frame_shape)
+    
+    def integrate_density(self, density_map: Any) -> np.ndarray:
+        """
+        Integrate a density map over all zones at once.
+        
+        Args:
+            density_map: DensityMap
             
-            # Create shapely polygon for point-in-polygon checks
-            poly = Polygon(polygon_pts)
-            self.polygons[zone_id] = poly
+        Returns:
+            Count per zone, in zone order
+        """
+        if self._density_key != (density_map.shape, density_map.frame_shape):
+            self.compile_density_matrix(density_map)
+        values = density_map.data.ravel()[self._matrix_cells] * self._matrix_weights
+        return np.bincount(self._matrix_rows, weights=values, minlength=len(self.zones))
     
-    def integrate_by_mask(self, density_map: np.ndarray, mask: np.ndarray) -> float:
+    def assign_boxes(self, boxes: Any) -> np.ndarray:
         """
-        Integrate density map within zone mask.
+        Map every box to the zone set containing its anchor point.
         
         Args:
-            density_map: Density map (H, W)
-            mask: Binary mask (H, W)
+            boxes: BoxArray of detections
             
         Returns:
-            Total count in zone
+            Zone-set id per box (row of zone_sets; 0 = outside all zones)
         """
-        # Normalize mask to 0-1
-        mask_norm = mask.astype(np.float32) / 255.0
+        if self.box_anchor == "foot":
+            x, y = boxes.foot_points()
+        else:
+            x, y = boxes.centers()
         
-        # Integrate
-        count = float((density_map * mask_norm).sum())
-        return count
+        h, w = self.label_map.shape
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        set_ids = np.zeros(len(boxes), dtype=np.int64)
+        set_ids[inside] = self.label_map[y[inside], x[inside]]
+        return set_ids
     
-    def integrate_boxes(self, boxes: List[Any], mask: np.ndarray) -> int:
+    def count_boxes(self, boxes: Any) -> np.ndarray:
         """
-        Count boxes whose centers are within zone mask.
+        Count boxes per zone.
         
         Args:
-            boxes: List of Box objects with x1, y1, x2, y2
-            mask: Binary mask (H, W)
+            boxes: BoxArray of detections
             
         Returns:
-            Count of boxes in zone
+            Count per zone, in zone order
         """
-        count = 0
-        for box in boxes:
-            # Box center
-            cx = int((box.x1 + box.x2) / 2)
-            cy = int((box.y1 + box.y2) / 2)
-            
-            # Check if center is in mask
-            if 0 <= cy < mask.shape[0] and 0 <= cx < mask.shape[1]:
-                if mask[cy, cx] > 0:
-                    count += 1
-        
-        return count
+        if len(boxes) == 0 or self.label_map is None:
+            return np.zeros(len(self.zones), dtype=np.int64)
+        per_set = np.bincount(self.assign_boxes(boxes), minlength=len(self.zone_sets))
+        return per_set @ self.zone_sets
     
     def compute_stats(
         self,
-        density_map: Optional[np.ndarray] = None,
-        boxes: Optional[List[Any]] = None,
+        density_map: Optional[Any] = None,
+        boxes: Optional[Any] = None,
         image_shape: Tuple[int, int] = None
     ) -> List[ZoneStats]:
         """
         Compute statistics for all zones.
         
         Args:
-            density_map: Density map (H, W) - for density model
-            boxes: List of Box objects - for detector model
+            density_map: DensityMap - for density model
+            boxes: BoxArray of detections - for detector model
             image_shape: (H, W) of image
             
         Returns:
@@ -130,35 +220,27 @@ class ZoneManager:
         if not self.zones:
             return []
         
-        # Setup zones if not done
-        if image_shape and not self.masks:
-            self.setup_zones(image_shape)
+        # Compute counts (boxes first: the detector heatmap is not a density)
+        if boxes is not None:
+            if image_shape and (self.label_map is None or self.label_map.shape != tuple(image_shape)):
+                self.setup_zones(image_shape)
+            counts = self.count_boxes(boxes)
+        elif density_map is not None:
+            counts = self.integrate_density(density_map)
+        else:
+            counts = np.zeros(len(self.zones))
         
         stats = []
-        for zone in self.zones:
-            zone_id = zone["id"]
+        for zone, count in zip(self.zones, counts.tolist()):
             threshold = zone.get("threshold")
             
-            # Get mask
-            mask = self.masks.get(zone_id)
-            if mask is None:
-                continue
-            
-            # Compute count
-            if density_map is not None:
-                count = self.integrate_by_mask(density_map, mask)
-            elif boxes is not None:
-                count = self.integrate_boxes(boxes, mask)
-            else:
-                count = 0
-            
             # Check alert threshold
             alert = False
             if threshold is not None:
                 alert = count >= threshold
             
             stats.append(ZoneStats(
-                id=zone_id,
+                id=zone["id"],
                 count=int(count),
                 alert=alert
             ))
@@ -0,0 +1,162 @@
+"""
+Benchmark per-frame Redis state writes with many simulated streams.
+
+Compares the direct path (a blocking SETEX and PUBLISH pipeline per frame)
+with the batching StateWriter. Every stream gets a simulated remote viewer
+of each image tier, so both paths move the same images through Redis.
+Needs a running Redis at settings.REDIS_URL.
+
+Usage:
+    python -m core.state.benchmark --streams 50 --fps 30 --seconds 10
+    python -m core.state.benchmark --streams 50 --image-kb 32
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from core.models.benchmark import print_rows
+from core.state import redis_state
+from core.state.live_message import IMAGE_TIERS
+from core.state.redis_state import StreamState
+from core.state.writer import StateWriter
+
+
+def _stats(stream_id: str, frame: int) -> Dict[str, Any]:
+    """Stats shaped like a stream worker's."""
+    return {
+        "id": stream_id,
+        "count": frame % 100,
+        "count_smoothed": float(frame % 100),
+        "fps": 30.0,
+        "latency_ms": 20.0,
+        "zones": [{"id": f"zone-{z}", "count": frame % 7, "alert": False} for z in range(4)],
+        "model_used": "hybrid",
+    }
+
+
+def _set_viewers(stream_ids: List[str], ttl_s: int):
+    """Register a simulated viewer of every image tier from another process (ttl_s=0 removes them)."""
+    pipe = redis_state.redis_client.pipeline(transaction=False)
+    for stream_id in stream_ids:
+        key = StreamState._key(stream_id, "viewers")
+        if ttl_s:
+            pipe.hset(key, mapping={f"benchmark:{tier}": 1 for tier in IMAGE_TIERS})
+            pipe.expire(key, ttl_s)
+        else:
+            pipe.delete(key)
+    pipe.execute()
+
+
+def _commands_processed() -> int:
+    return int(redis_state.redis_client.info("stats")["total_commands_processed"])
+
+
+async def _measure_loop_lag(lags: List[float], interval_s: float = 0.005):
+    """Record how late the event loop wakes up from short sleeps."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        lags.append((time.perf_counter() - start - interval_s) * 1000)
+
+
+async def run_mode(mode: str, streams: int, fps: float, seconds: float, image_kb: int) -> Dict[str, Any]:
+    """
+    Simulate streams submitting state at fps for a while.
+
+    Args:
+        mode: "direct" or "writer"
+        streams: Number of simulated streams
+        fps: Frames per second per stream
+        seconds: Duration
+        image_kb: Heatmap size per frame (and frame size every other frame), 0 for stats only
+
+    Returns:
+        Benchmark row
+    """
+    image = b"\0" * (image_kb * 1024) if image_kb else None
+    writer = StateWriter(settings.STATE_FLUSH_INTERVAL_MS, settings.STATE_STATS_RATE_HZ)
+    if mode == "writer":
+        await writer.start()
+        for index in range(streams):
+            writer.add_stream(f"bench-{index}")
+        await writer.flush()  # Read the simulated viewers before the first frame
+    frames = 0
+    round_trips = 0
+
+    async def stream(index: int):
+        nonlocal frames, round_trips
+        stream_id = f"bench-{index}"
+        frame = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame += 1
+            stats = _stats(stream_id, frame)
+            frame_data = image if frame % 2 == 0 else None
+            if mode == "writer":
+                writer.submit(stream_id, stats, image, frame_data)
+            else:
+                StreamState.update_stats(stream_id, stats)
+                StreamState.publish_update(stream_id, stats, image, frame_data)
+                round_trips += 2
+            frames += 1
+            await asyncio.sleep(1.0 / fps)
+
+    lags: List[float] = []
+    lag_task = asyncio.create_task(_measure_loop_lag(lags))
+    commands_before = _commands_processed()
+    start = time.perf_counter()
+    await asyncio.gather(*(stream(i) for i in range(streams)))
+    if mode == "writer":
+        await writer.stop()
+        round_trips = writer.flushes
+    elapsed = time.perf_counter() - start
+    commands = _commands_processed() - commands_before
+    lag_task.cancel()
+
+    lag = np.array(lags or [0.0])
+    return {
+        "mode": mode,
+        "streams": streams,
+        "frames_per_s": frames / elapsed,
+        "redis_ops_per_s": commands / elapsed,
+        "round_trips_per_s": round_trips / elapsed,
+        "loop_lag_ms_p50": float(np.percentile(lag, 50)),
+        "loop_lag_ms_p95": float(np.percentile(lag, 95)),
+    }
+
+
+async def compare(streams: int, fps: float, seconds: float, image_kb: int) -> List[Dict[str, Any]]:
+    """Run both modes one after the other."""
+    stream_ids = [f"bench-{index}" for index in range(streams)]
+    _set_viewers(stream_ids, ttl_s=int(2 * seconds) + 60)
+    rows = []
+    try:
+        for mode in ("direct", "writer"):
+            rows.append(await run_mode(mode, streams, fps, seconds, image_kb))
+    finally:
+        _set_viewers(stream_ids, ttl_s=0)
+        await redis_state.close_async_redis()
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark per-frame Redis state writes")
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--fps", type=float, default=30.0, help="Frames per second per stream")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--image-kb", type=int, default=0, help="Simulated heatmap/frame size")
+    args = parser.parse_args(argv)
+
+    if not redis_state.REDIS_AVAILABLE:
+        parser.error(f"Redis is not reachable at {settings.REDIS_URL}")
+    print(f"{args.streams} streams at {args.fps:g} FPS for {args.seconds:g}s, images {args.image_kb} KB")
+    print_rows(asyncio.run(compare(args.streams, args.fps, args.seconds, args.image_kb)))
+
+
+if __name__ == "__main__":
+    main()
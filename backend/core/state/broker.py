@@ -0,0 +1,89 @@
+"""In-process delivery of live updates."""
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, List, Set, Tuple
+
+from core.state.redis_state import LiveUpdate
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Latest live messages kept per stream
+RING_SIZE = 16
+
+Consumer = Callable[[str, bytes, str], None]  # (stream_id, message, tier)
+
+
+class LiveBroker:
+    """
+    Hand live updates from stream workers to WebSocket consumers in the same process.
+
+    Streams produced here are delivered directly, full images included, with
+    no Redis round trip and no serialization beyond the live message itself;
+    Redis is only needed for viewers in other processes (and consumers skip
+    Redis messages of local streams). It also works without Redis at all.
+
+    A small ring of each stream's latest messages lets new viewers start
+    from the current stats and images. Everything runs on the event loop.
+    """
+
+    def __init__(self, ring_size: int = RING_SIZE):
+        self.ring_size = ring_size
+        self._producers: Set[str] = set()
+        self._rings: Dict[str, Deque[Tuple[str, bytes]]] = {}  # stream_id -> (tier, message)
+        self._consumers: List[Tuple[Consumer, Callable[[str], Set[str]]]] = []
+
+    def add_producer(self, stream_id: str):
+        """Mark a stream as produced in this process."""
+        self._producers.add(stream_id)
+        self._rings[stream_id] = deque(maxlen=self.ring_size)
+
+    def remove_producer(self, stream_id: str):
+        """Forget a stream produced in this process."""
+        self._producers.discard(stream_id)
+        self._rings.pop(stream_id, None)
+
+    def is_local(self, stream_id: str) -> bool:
+        """Whether a stream is produced in this process."""
+        return stream_id in self._producers
+
+    def add_consumer(self, deliver: Consumer, watched_tiers: Callable[[str], Set[str]]):
+        """
+        Register a consumer.
+
+        Args:
+            deliver: Called with (stream_id, message, tier) for every update; must not block
+            watched_tiers: Tiers of a stream the consumer currently wants
+        """
+        self._consumers.append((deliver, watched_tiers))
+
+    def watched_tiers(self, stream_id: str) -> Set[str]:
+        """Tiers of a stream wanted by any consumer in this process."""
+        tiers: Set[str] = set()
+        for _, watched in self._consumers:
+            tiers |= watched(stream_id)
+        return tiers
+
+    def publish(self, stream_id: str, updates: List[LiveUpdate]):
+        """Deliver a frame's live updates, with full images, to consumers."""
+        ring = self._rings.get(stream_id)
+        for update in updates:
+            message = update.image_message or update.message
+            if ring is not None:
+                ring.append((update.tier, message))
+            for deliver, _ in self._consumers:
+                try:
+                    deliver(stream_id, message, update.tier)
+                except Exception as e:
+                    logger.warning(f"Live consumer failed for stream {stream_id}: {e}")
+
+    def latest(self, stream_id: str, tiers: FrozenSet[str]) -> List[Tuple[str, bytes]]:
+        """Newest kept message of each requested tier, stats first."""
+        newest: Dict[str, bytes] = {}
+        for tier, message in reversed(self._rings.get(stream_id, ())):
+            if tier in tiers and tier not in newest:
+                newest[tier] = message
+        return sorted(newest.items(), key=lambda item: item[0] != "stats")
+
+
+# Shared broker for this process
+live_broker = LiveBroker()
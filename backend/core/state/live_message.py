@@ -0,0 +1,159 @@
+"""
+Binary live update messages.
+
+A live update is one binary message (Redis payload and WebSocket frame):
+
+    header   16 bytes, little endian:
+             magic b"CD" | version u8 | flags u8 | stats_len u32 | heatmap_len u32 | frame_len u32
+    stats    stats_len bytes of UTF-8 JSON
+    heatmap  heatmap_len bytes of encoded image (type in stats["heatmap_type"])
+    frame    frame_len bytes of encoded image (type in stats["frame_type"])
+
+Images travel as raw bytes instead of base64 data URLs inside JSON. Clients
+that can't handle binary frames get the JSON form from live_message_to_json.
+
+Updates are published in tiers, each on its own channel, so a viewer only
+receives what it asked for: "stats" messages carry no images; image tier
+messages carry stats {"type": "frame_image", "tier": ..., "ts": ..., "seq": ...}
+and a single image (the heatmap segment for "heatmap", the frame segment
+otherwise).
+
+Image messages are too large to copy to every subscriber, so producers
+store the latest one per tier under a key and publish only a small
+{"type": "frame_ref", "tier": ..., "ts": ..., "seq": ...} message; consumers
+fetch the image if they still have viewers for the tier.
+"""
+import base64
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+MAGIC = b"CD"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIII")
+
+TIERS = ("stats", "thumbnail", "frame", "heatmap")
+IMAGE_TIERS = TIERS[1:]
+
+
+def encode_live_message(
+    stats: Dict[str, Any],
+    heatmap: Optional[bytes] = None,
+    frame: Optional[bytes] = None,
+    heatmap_type: str = "image/png",
+    frame_type: str = "image/jpeg",
+) -> bytes:
+    """
+    Encode a live update.
+
+    Args:
+        stats: JSON-serializable stats
+        heatmap: Encoded heatmap image
+        frame: Encoded preview frame
+        heatmap_type: MIME type of heatmap
+        frame_type: MIME type of frame
+
+    Returns:
+        Binary message
+    """
+    stats = dict(stats)
+    if heatmap:
+        stats["heatmap_type"] = heatmap_type
+    if frame:
+        stats["frame_type"] = frame_type
+    stats_bytes = json.dumps(stats).encode("utf-8")
+    heatmap = heatmap or b""
+    frame = frame or b""
+    header = HEADER.pack(MAGIC, VERSION, 0, len(stats_bytes), len(heatmap), len(frame))
+    return b"".join((header, stats_bytes, heatmap, frame))
+
+
+def decode_live_message(data: bytes) -> Tuple[Dict[str, Any], Optional[bytes], Optional[bytes]]:
+    """
+    Decode a live update.
+
+    Returns:
+        (stats, heatmap bytes or None, frame bytes or None)
+    """
+    magic, version, _, stats_len, heatmap_len, frame_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported live message (magic={magic!r}, version={version})")
+    view = memoryview(data)
+    offset = HEADER.size
+    stats = json.loads(bytes(view[offset:offset + stats_len]))
+    offset += stats_len
+    heatmap = bytes(view[offset:offset + heatmap_len]) if heatmap_len else None
+    offset += heatmap_len
+    frame = bytes(view[offset:offset + frame_len]) if frame_len else None
+    return stats, heatmap, frame
+
+
+def read_stats(data: bytes) -> Dict[str, Any]:
+    """Decode only the stats of a live update, leaving images untouched."""
+    magic, version, _, stats_len, _, _ = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported live message (magic={magic!r}, version={version})")
+    return json.loads(bytes(memoryview(data)[HEADER.size:HEADER.size + stats_len]))
+
+
+def encode_image_message(tier: str, image: bytes, ts: float, mime_type: str, seq: int = 0) -> bytes:
+    """
+    Encode an image tier update.
+
+    Args:
+        tier: One of IMAGE_TIERS
+        image: Encoded image
+        ts: Timestamp of the frame it belongs to
+        mime_type: MIME type of image
+        seq: Sequence number of the frame
+
+    Returns:
+        Binary message
+    """
+    stats = {"type": "frame_image", "tier": tier, "ts": ts, "seq": seq}
+    if tier == "heatmap":
+        return encode_live_message(stats, heatmap=image, heatmap_type=mime_type)
+    return encode_live_message(stats, frame=image, frame_type=mime_type)
+
+
+def with_stats(data: bytes, **fields: Any) -> bytes:
+    """Copy of a live update with fields added to its stats; images are kept as they are."""
+    magic, version, flags, stats_len, heatmap_len, frame_len = HEADER.unpack_from(data)
+    stats = read_stats(data)
+    stats.update(fields)
+    stats_bytes = json.dumps(stats).encode("utf-8")
+    header = HEADER.pack(magic, version, flags, len(stats_bytes), heatmap_len, frame_len)
+    return b"".join((header, stats_bytes, memoryview(data)[HEADER.size + stats_len:]))
+
+
+def encode_frame_ref(tier: str, ts: float, seq: int) -> bytes:
+    """Encode a reference to a stored image tier update."""
+    return encode_live_message({"type": "frame_ref", "tier": tier, "ts": ts, "seq": seq})
+
+
+def live_message_to_json(data: bytes) -> str:
+    """
+    Convert a binary live update to the JSON form with base64 data URLs.
+
+    Only images present in the message get a key ("heatmap", "frame" and its
+    "frame_url" alias, or "thumbnail"), so clients can merge updates.
+    """
+    stats, heatmap, frame = decode_live_message(data)
+    message = dict(stats)
+    heatmap_type = message.pop("heatmap_type", "image/png")
+    frame_type = message.pop("frame_type", "image/jpeg")
+    if heatmap:
+        message["heatmap"] = _data_url(heatmap, heatmap_type)
+    if frame:
+        if message.get("tier") == "thumbnail":
+            message["thumbnail"] = _data_url(frame, frame_type)
+        else:
+            message["frame"] = _data_url(frame, frame_type)
+            message["frame_url"] = message["frame"]  # Alias for frontend compatibility
+    return json.dumps(message)
+
+
+def _data_url(payload: Optional[bytes], mime_type: str) -> Optional[str]:
+    if not payload:
+        return None
+    return f"data:{mime_type};base64,{base64.b64encode(payload).decode('ascii')}"
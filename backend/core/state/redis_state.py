@@ -1,13 +1,34 @@
 """Redis state management for live stream stats."""
 import redis
+import redis.asyncio as aioredis
+import itertools
 import json
-from typing import Dict, Optional, Any
+import os
+import socket
+import time
+from typing import Dict, List, NamedTuple, Optional, Any, Set
 from datetime import datetime
 from app.config import settings
+from core.state.live_message import encode_live_message, encode_image_message, encode_frame_ref
 from core.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Viewer counts expire unless the API process holding the WebSockets refreshes them
+VIEWERS_TTL_S = 10
+
+# Stored stats snapshots expire when a stream stops updating them
+STATS_TTL_S = 300
+
+# Latest image of each live tier; only needs to outlive the reference published with it
+LATEST_IMAGE_TTL_S = 5
+
+# Sequence numbers of live updates produced by this process
+_sequence = itertools.count(1)
+
+# Identifies this process in shared state (viewer counts, consumer groups)
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
 # Try to connect to Redis, but make it optional
 try:
     redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
@@ -21,6 +42,33 @@ except Exception as e:
     # Fallback in-memory store
     _in_memory_store: Dict[str, Dict] = {}
 
+# Process-wide async connection pool (created on first use); binary payloads, no decoding
+_async_pool: Optional[aioredis.ConnectionPool] = None
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Async Redis client on the process-wide connection pool."""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = aioredis.ConnectionPool.from_url(settings.REDIS_URL)
+    return aioredis.Redis(connection_pool=_async_pool)
+
+
+async def close_async_redis():
+    """Disconnect the process-wide async connection pool."""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.disconnect()
+        _async_pool = None
+
+
+class LiveUpdate(NamedTuple):
+    """One tier of a frame's live update."""
+    tier: str
+    channel: str
+    message: bytes  # Published message: the stats, or a frame_ref to the image
+    image_message: Optional[bytes] = None  # Full image message, stored under StreamState.latest_key
+
 
 class StreamState:
     """Manage stream state in Redis."""
@@ -32,13 +80,20 @@ class StreamState:
         return f"{base}:{field}" if field else base
     
     @staticmethod
-    def update_stats(stream_id: str, stats: Dict[str, Any]):
-        """Update stream statistics."""
-        stats["updated_at"] = datetime.utcnow().isoformat()
+    def stamp_stats(stats: Dict[str, Any]) -> float:
+        """Set stats["updated_at"] to now and return the same instant as a timestamp."""
+        ts = time.time()
+        stats["updated_at"] = datetime.utcfromtimestamp(ts).isoformat()
+        return ts
+    
+    @staticmethod
+    def update_stats(stream_id: str, stats: Dict[str, Any]) -> float:
+        """Update stream statistics; returns the timestamp they were stamped with."""
+        ts = StreamState.stamp_stats(stats)
         if REDIS_AVAILABLE and redis_client:
             try:
                 key = StreamState._key(stream_id, "stats")
-                redis_client.setex(key, 300, json.dumps(stats))  # 5 min TTL
+                redis_client.setex(key, STATS_TTL_S, json.dumps(stats))
                 logger.debug(f"Updated stats in Redis for stream {stream_id}")
             except Exception as e:
                 logger.error(f"Failed to update stats in Redis for stream {stream_id}: {e}", exc_info=True)
@@ -46,6 +101,7 @@ class StreamState:
             # Fallback to in-memory
             _in_memory_store[f"{stream_id}:stats"] = stats
             logger.debug(f"Updated stats in memory for stream {stream_id}")
+        return ts
     
     @staticmethod
     def get_stats(stream_id: str) -> Optional[Dict[str, Any]]:
@@ -61,43 +117,142 @@ class StreamState:
         return None
     
     @staticmethod
-    def publish_update(stream_id: str, stats: Dict[str, Any], heatmap_data: str = None, frame_data: str = None):
-        """Publish stats update to Redis pub/sub."""
+    async def get_stats_async(stream_id: str) -> Optional[Dict[str, Any]]:
+        """Get current stream statistics without blocking the event loop."""
+        if REDIS_AVAILABLE and redis_client:
+            data = await get_async_redis().get(StreamState._key(stream_id, "stats"))
+            return json.loads(data) if data else None
+        # Fallback to in-memory
+        return _in_memory_store.get(f"{stream_id}:stats")
+    
+    @staticmethod
+    def live_channel(stream_id: str, tier: str = "stats") -> str:
+        """Pub/sub channel of a live update tier."""
+        base = StreamState._key(stream_id, "live")
+        return base if tier == "stats" else f"{base}:{tier}"
+    
+    @staticmethod
+    def events_key(stream_id: str) -> str:
+        """Redis Stream of a stream's live updates (LIVE_TRANSPORT="streams")."""
+        return StreamState._key(stream_id, "events")
+    
+    @staticmethod
+    def queue_live_update(pipe, stream_id: str, update: LiveUpdate):
+        """
+        Add the commands delivering a live update to a pipeline (sync or async).
+        
+        The image, if any, is stored first; the message then goes to the tier's
+        pub/sub channel, or to the stream's capped Redis Stream with the
+        "streams" transport.
+        """
+        if update.image_message:
+            pipe.set(StreamState.latest_key(stream_id, update.tier), update.image_message, ex=LATEST_IMAGE_TTL_S)
+        if settings.LIVE_TRANSPORT == "streams":
+            pipe.xadd(
+                StreamState.events_key(stream_id),
+                {"tier": update.tier, "data": update.message},
+                maxlen=settings.LIVE_STREAM_MAXLEN,
+                approximate=True,
+            )
+        else:
+            pipe.publish(update.channel, update.message)
+    
+    @staticmethod
+    def latest_key(stream_id: str, tier: str) -> str:
+        """Key holding the latest image message of a live tier."""
+        return StreamState._key(stream_id, f"latest:{tier}")
+    
+    @staticmethod
+    def live_updates(
+        stream_id: str,
+        stats: Dict[str, Any],
+        ts: float,
+        heatmap_data: bytes = None,
+        frame_data: bytes = None,
+        thumbnail_data: bytes = None
+    ) -> List[LiveUpdate]:
+        """
+        Binary live messages of a frame, one per tier.
+        
+        Images are not published themselves: each image tier gets a small
+        frame_ref message, and the image message is stored under latest_key.
+        
+        Returns:
+            Stats update always, plus an update per image given
+        """
+        stats_message = {
+            "type": "frame_stats",
+            "ts": ts,
+            "count": stats.get("count", 0),
+            "zones": stats.get("zones", []),
+            "fps": stats.get("fps", 0.0),
+            "model": stats.get("model_used", "unknown"),
+        }
+        updates = [LiveUpdate("stats", StreamState.live_channel(stream_id), encode_live_message(stats_message))]
+        seq = next(_sequence)
+        for tier, image, mime_type in (
+            ("heatmap", heatmap_data, "image/png"),
+            ("frame", frame_data, "image/jpeg"),
+            ("thumbnail", thumbnail_data, "image/jpeg"),
+        ):
+            if image:
+                updates.append(LiveUpdate(
+                    tier,
+                    StreamState.live_channel(stream_id, tier),
+                    encode_frame_ref(tier, ts, seq),
+                    encode_image_message(tier, image, ts, mime_type, seq),
+                ))
+        return updates
+    
+    @staticmethod
+    def publish_update(
+        stream_id: str,
+        stats: Dict[str, Any],
+        heatmap_data: bytes = None,
+        frame_data: bytes = None,
+        thumbnail_data: bytes = None
+    ):
+        """
+        Publish a frame's live update tiers to Redis pub/sub as binary live messages.
+        
+        Stats always go out; each image (PNG heatmap, JPEG frame, JPEG
+        thumbnail) is stored under its tier's latest_key and referenced on
+        the tier channel (see queue_live_update). Stream workers go through
+        the batching StateWriter instead.
+        """
         if not REDIS_AVAILABLE or not redis_client:
             logger.debug(f"Redis not available, skipping pub/sub for stream {stream_id}")
             return  # Skip if Redis not available
         
         try:
-            channel = StreamState._key(stream_id, "live")
-            # Ensure stats are JSON-serializable
-            import time
-            updated_at = stats.get("updated_at")
-            if isinstance(updated_at, str):
-                # Try to convert to timestamp
-                try:
-                    dt = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-                    ts = dt.timestamp()
-                except:
-                    ts = time.time()
-            else:
-                ts = time.time()
-            
-            stats_copy = {
-                "type": "frame_stats",
-                "ts": ts,
-                "count": stats.get("count", 0),
-                "zones": stats.get("zones", []),
-                "fps": stats.get("fps", 0.0),
-                "model": stats.get("model_used", "unknown"),
-                "heatmap": heatmap_data,
-                "frame": frame_data,  # Base64-encoded frame
-                "frame_url": frame_data,  # Alias for frontend compatibility
-            }
-            redis_client.publish(channel, json.dumps(stats_copy))
-            logger.debug(f"Published stats update to Redis channel {channel} for stream {stream_id}")
+            pipe = redis_client.pipeline(transaction=False)
+            for update in StreamState.live_updates(
+                stream_id, stats, time.time(), heatmap_data, frame_data, thumbnail_data
+            ):
+                StreamState.queue_live_update(pipe, stream_id, update)
+            pipe.execute()
+            logger.debug(f"Published live update to Redis for stream {stream_id}")
         except Exception as e:
             logger.error(f"Failed to publish update to Redis for stream {stream_id}: {e}", exc_info=True)
     
+    @staticmethod
+    def parse_viewers(viewers: Dict[Any, Any], exclude_instance: Optional[str] = None) -> Set[str]:
+        """
+        Watched tiers from a viewers hash ("<instance>:<tier>" -> count, str or bytes).
+        
+        Args:
+            viewers: Hash contents
+            exclude_instance: Ignore the viewers of this instance
+        """
+        tiers = set()
+        for field, count in viewers.items():
+            if isinstance(field, bytes):
+                field = field.decode()
+            instance, tier = field.rsplit(":", 1)
+            if int(count) > 0 and instance != exclude_instance:
+                tiers.add(tier)
+        return tiers
+    
     @staticmethod
     def set_status(stream_id: str, status: str):
         """Set stream status."""
@@ -117,4 +272,35 @@ class StreamState:
         else:
             # Fallback to in-memory
             return _in_memory_store.get(f"{stream_id}:status")
+    
+    @staticmethod
+    def get_many(stream_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Status and stats of several streams in one round trip (a single MGET).
+        
+        Returns:
+            {stream_id: {"status": str or None, "stats": dict or None}}
+        """
+        if not stream_ids:
+            return {}
+        if REDIS_AVAILABLE and redis_client:
+            keys = []
+            for stream_id in stream_ids:
+                keys += [StreamState._key(stream_id, "status"), StreamState._key(stream_id, "stats")]
+            values = redis_client.mget(keys)
+            return {
+                stream_id: {
+                    "status": values[2 * i],
+                    "stats": json.loads(values[2 * i + 1]) if values[2 * i + 1] else None,
+                }
+                for i, stream_id in enumerate(stream_ids)
+            }
+        # Fallback to in-memory
+        return {
+            stream_id: {
+                "status": _in_memory_store.get(f"{stream_id}:status"),
+                "stats": _in_memory_store.get(f"{stream_id}:stats"),
+            }
+            for stream_id in stream_ids
+        }
 
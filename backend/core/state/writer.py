@@ -0,0 +1,216 @@
+"""Batched, coalesced Redis writes of per-frame stream state."""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from core.state.broker import live_broker
+from core.state.live_message import TIERS
+from core.state.redis_state import INSTANCE_ID, LiveUpdate, StreamState, STATS_TTL_S, get_async_redis
+from core.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# How often the watched tiers of registered streams are re-read
+VIEWER_CHECK_INTERVAL_S = 1.0
+
+
+class StateWriter:
+    """
+    Write per-frame stream state to Redis off the frame loop.
+
+    Stream workers call submit() once per frame; it hands the live update to
+    the in-process LiveBroker right away and records it for Redis. A
+    background task flushes everything pending for all streams every
+    flush_interval_ms in a single Redis pipeline (one round trip):
+
+    - live messages are coalesced per channel, so only the latest stats and
+      the latest image of each tier since the last flush go out; images are
+      stored under their tier's latest key and only a reference is sent
+      (see StreamState.queue_live_update);
+    - the stored stats snapshot (read by the REST API) is rewritten at most
+      stats_rate_hz times per second per stream, always ending on the latest;
+    - the watched tiers of registered streams are read back every
+      VIEWER_CHECK_INTERVAL_S in the same pipeline. Images of tiers that
+      only viewers in this process watch stay out of Redis: the broker
+      already delivered them.
+
+    Connections come from the process-wide async pool. Without Redis,
+    stats go to StreamState's in-memory fallback and nothing is published.
+    """
+
+    def __init__(self, flush_interval_ms: float = 50.0, stats_rate_hz: float = 2.0):
+        self.flush_interval_s = flush_interval_ms / 1000
+        self.stats_interval_s = 1.0 / stats_rate_hz if stats_rate_hz > 0 else 0.0
+        self.redis = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._updates: Dict[str, Tuple[str, LiveUpdate]] = {}  # channel -> (stream_id, latest update)
+        self._snapshots: Dict[str, str] = {}  # stream_id -> latest stats JSON not yet stored
+        self._stored_at: Dict[str, float] = {}  # stream_id -> time of last stored snapshot
+        self._streams: Set[str] = set()  # Streams whose watched tiers are tracked
+        self._watched: Dict[str, Set[str]] = {}  # Tiers watched from other processes
+        self._viewers_checked_at = 0.0
+        self.flushes = 0
+        self.commands = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Connect to Redis and start flushing (stays in fallback mode if Redis is unavailable)."""
+        client = get_async_redis()
+        try:
+            await client.ping()
+        except Exception as e:
+            logger.warning(f"Redis not available for state writes: {e}. Using in-memory fallback.")
+            await client.aclose()
+            return
+        self.redis = client
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"State writer started (flush every {self.flush_interval_s * 1000:.0f}ms, "
+            f"stats snapshot every {self.stats_interval_s * 1000:.0f}ms per stream)"
+        )
+
+    async def stop(self):
+        """Flush what is pending and stop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._stored_at.clear()  # Write every remaining snapshot
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Final state flush failed: {e}")
+        await self.redis.aclose()
+        self.redis = None
+
+    def add_stream(self, stream_id: str):
+        """Start tracking the watched tiers of a stream."""
+        self._streams.add(stream_id)
+        self._viewers_checked_at = 0.0  # Read them on the next flush
+        self._wakeup.set()
+
+    def remove_stream(self, stream_id: str):
+        """Stop tracking a stream."""
+        self._streams.discard(stream_id)
+        self._watched.pop(stream_id, None)
+        self._stored_at.pop(stream_id, None)  # Its last snapshot goes out on the next flush
+
+    def watched_tiers(self, stream_id: str) -> Set[str]:
+        """Live update tiers some WebSocket client subscribes to (other processes as of the last check)."""
+        return self._watched.get(stream_id, set()) | live_broker.watched_tiers(stream_id)
+
+    def submit(
+        self,
+        stream_id: str,
+        stats: Dict[str, Any],
+        heatmap_data: bytes = None,
+        frame_data: bytes = None,
+        thumbnail_data: bytes = None
+    ):
+        """
+        Record a frame's stats and images for the next flush.
+
+        Args:
+            stream_id: Stream ID
+            stats: Stream stats (updated_at is set here)
+            heatmap_data: Encoded heatmap image
+            frame_data: Encoded preview frame
+            thumbnail_data: Encoded thumbnail
+        """
+        if not self.running:
+            ts = StreamState.update_stats(stream_id, stats)
+        else:
+            ts = StreamState.stamp_stats(stats)
+            self._snapshots[stream_id] = json.dumps(stats)
+        updates = StreamState.live_updates(stream_id, stats, ts, heatmap_data, frame_data, thumbnail_data)
+        live_broker.publish(stream_id, updates)
+        if not self.running:
+            return
+        remote_tiers = self._watched.get(stream_id, set())
+        for update in updates:
+            if update.tier == "stats" or update.tier in remote_tiers:
+                self._updates[update.channel] = (stream_id, update)
+        self._wakeup.set()
+
+    async def _run(self):
+        """Flush whenever something is pending, at most once per flush interval."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"State flush failed: {e}")
+            # Keep going while snapshots are held back by the stats rate or viewers need re-reading
+            if self._snapshots or self._streams:
+                self._wakeup.set()
+            await asyncio.sleep(self.flush_interval_s)
+
+    async def flush(self):
+        """Write everything pending in one pipeline."""
+        now = time.monotonic()
+        updates, self._updates = self._updates, {}
+        snapshots = {}
+        for stream_id, snapshot in list(self._snapshots.items()):
+            if now - self._stored_at.get(stream_id, float("-inf")) >= self.stats_interval_s:
+                snapshots[stream_id] = self._snapshots.pop(stream_id)
+                self._stored_at[stream_id] = now
+        viewer_streams: List[str] = []
+        if self._streams and now - self._viewers_checked_at >= VIEWER_CHECK_INTERVAL_S:
+            viewer_streams = sorted(self._streams)
+            self._viewers_checked_at = now
+        if not (updates or snapshots or viewer_streams):
+            return
+
+        pipe = self.redis.pipeline(transaction=False)
+        for stream_id, snapshot in snapshots.items():
+            pipe.setex(StreamState._key(stream_id, "stats"), STATS_TTL_S, snapshot)
+        for stream_id, update in updates.values():
+            StreamState.queue_live_update(pipe, stream_id, update)
+        for stream_id in viewer_streams:
+            pipe.hgetall(StreamState._key(stream_id, "viewers"))
+        commands = len(pipe)
+        try:
+            results = await pipe.execute()
+        except Exception as e:
+            # Retry snapshots unless a newer one arrived; live messages are stale by now
+            for stream_id, snapshot in snapshots.items():
+                self._snapshots.setdefault(stream_id, snapshot)
+                self._stored_at.pop(stream_id, None)
+            for stream_id in viewer_streams:
+                self._watched[stream_id] = set(TIERS)  # Assume watched rather than blank someone's dashboard
+            raise ConnectionError(f"Redis pipeline of {commands} commands failed: {e}") from e
+        self.flushes += 1
+        self.commands += commands
+
+        for stream_id, viewers in zip(viewer_streams, results[len(results) - len(viewer_streams):]):
+            if stream_id in self._streams:
+                self._watched[stream_id] = StreamState.parse_viewers(viewers, exclude_instance=INSTANCE_ID)
+
+    def stats(self) -> Dict[str, Any]:
+        """Flush counters."""
+        return {
+            "flushes": self.flushes,
+            "commands": self.commands,
+            "pending_updates": len(self._updates),
+            "pending_snapshots": len(self._snapshots),
+        }
+
+
+# Shared writer for this process
+state_writer = StateWriter(
+    flush_interval_ms=settings.STATE_FLUSH_INTERVAL_MS,
+    stats_rate_hz=settings.STATE_STATS_RATE_HZ,
+)
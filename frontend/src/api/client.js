@@ -33,10 +33,57 @@ export const inferenceApi = {
   },
 }
 
+// Binary live message: 16-byte little-endian header
+// (magic "CD", version, flags, statsLen, heatmapLen, frameLen), JSON stats, heatmap, frame
+const LIVE_HEADER_SIZE = 16
+const textDecoder = new TextDecoder()
+
+export const decodeLiveMessage = (buffer) => {
+  const view = new DataView(buffer)
+  if (view.getUint8(0) !== 0x43 || view.getUint8(1) !== 0x44 || view.getUint8(2) !== 1) {
+    throw new Error('Unsupported live message')
+  }
+  const statsLen = view.getUint32(4, true)
+  const heatmapLen = view.getUint32(8, true)
+  const frameLen = view.getUint32(12, true)
+
+  let offset = LIVE_HEADER_SIZE
+  const data = JSON.parse(textDecoder.decode(new Uint8Array(buffer, offset, statsLen)))
+  offset += statsLen
+
+  // Only images present in the message get a key, so updates can be merged
+  const toUrl = (length, type) =>
+    URL.createObjectURL(new Blob([new Uint8Array(buffer, offset, length)], { type }))
+  if (heatmapLen) data.heatmap = toUrl(heatmapLen, data.heatmap_type)
+  offset += heatmapLen
+  if (frameLen) {
+    if (data.tier === 'thumbnail') {
+      data.thumbnail = toUrl(frameLen, data.frame_type)
+    } else {
+      data.frame = toUrl(frameLen, data.frame_type)
+      data.frame_url = data.frame
+    }
+  }
+  return data
+}
+
+const IMAGE_KEYS = ['heatmap', 'frame', 'thumbnail']
+
 // WebSocket client helper
-export const wsLive = (id, onMessage) => {
-  const wsUrl = `${WS_BASE}/ws/streams/${id}/live`
+// options.tiers: any of 'stats', 'thumbnail', 'frame', 'heatmap' (server default: stats, frame, heatmap)
+// options.maxFps: cap on image messages per second
+export const wsLive = (id, onMessage, { tiers, maxFps } = {}) => {
+  const params = new URLSearchParams()
+  if (tiers) params.set('tiers', tiers.join(','))
+  if (maxFps) params.set('max_fps', String(maxFps))
+  const query = params.toString()
+  const wsUrl = `${WS_BASE}/ws/streams/${id}/live${query ? `?${query}` : ''}`
   const ws = new WebSocket(wsUrl)
+  ws.binaryType = 'arraybuffer'
+
+  // Object URLs per image slot; the previous one is released once the next one has arrived
+  const previousUrls = {}
+  const currentUrls = {}
 
   ws.onopen = () => {
     console.log(`WebSocket connected for stream ${id}`)
@@ -44,7 +91,14 @@ export const wsLive = (id, onMessage) => {
 
   ws.onmessage = (event) => {
     try {
-      const data = JSON.parse(event.data)
+      const data = typeof event.data === 'string' ? JSON.parse(event.data) : decodeLiveMessage(event.data)
+      IMAGE_KEYS.forEach((key) => {
+        const url = data[key]
+        if (!url || !url.startsWith('blob:')) return
+        if (previousUrls[key]) URL.revokeObjectURL(previousUrls[key])
+        previousUrls[key] = currentUrls[key]
+        currentUrls[key] = url
+      })
       onMessage(data)
     } catch (error) {
       console.error('Error parsing WebSocket message:', error)
@@ -57,6 +111,8 @@ export const wsLive = (id, onMessage) => {
 
   ws.onclose = () => {
     console.log(`WebSocket closed for stream ${id}`)
+    Object.values(previousUrls).concat(Object.values(currentUrls))
+      .forEach((url) => url && URL.revokeObjectURL(url))
   }
 
   return () => {
@@ -76,10 +132,12 @@ export class WebSocketClient {
     this.onMessage = null
     this.onError = null
     this.onClose = null
+    this.lastEventId = null // Set with the Redis Streams transport; replays missed stats on reconnect
   }
 
   connect() {
-    const wsUrl = `${WS_BASE}/ws/streams/${this.streamId}/live`
+    const resume = this.lastEventId ? `&last_id=${encodeURIComponent(this.lastEventId)}` : ''
+    const wsUrl = `${WS_BASE}/ws/streams/${this.streamId}/live?format=json${resume}`
     this.ws = new WebSocket(wsUrl)
 
     this.ws.onopen = () => {
@@ -90,6 +148,9 @@ export class WebSocketClient {
     this.ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data)
+        if (data.event_id) {
+          this.lastEventId = data.event_id
+        }
         if (this.onMessage) {
           this.onMessage(data)
         }
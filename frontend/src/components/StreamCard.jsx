@@ -1,10 +1,24 @@
 /** Stream card component with live stats */
 import { useNavigate } from 'react-router-dom'
 import { useState, useEffect } from 'react'
+import { wsLive } from '../api/client'
 
 export default function StreamCard({ stream }) {
   const navigate = useNavigate()
   const [showActions, setShowActions] = useState(false)
+  const [live, setLive] = useState(null)
+
+  // Stats-only live subscription: no images are encoded or sent for cards
+  useEffect(() => {
+    if (stream.status !== 'running') {
+      setLive(null)
+      return
+    }
+    return wsLive(stream.id, setLive, { tiers: ['stats'] })
+  }, [stream.id, stream.status])
+
+  const count = live?.count ?? stream.count
+  const fps = live?.fps ?? stream.fps
 
   const statusConfig = {
     running: {
@@ -95,13 +109,13 @@ export default function StreamCard({ stream }) {
         <div className="bg-white/5 rounded-xl p-4 border border-white/5">
           <div className="text-xs text-gray-400 mb-2 uppercase tracking-wide">Count</div>
           <div className="text-3xl font-bold text-white">
-            {stream.count ?? 0}
+            {count ?? 0}
           </div>
         </div>
         <div className="bg-white/5 rounded-xl p-4 border border-white/5">
           <div className="text-xs text-gray-400 mb-2 uppercase tracking-wide">FPS</div>
           <div className="text-3xl font-bold text-white">
-            {stream.fps ? stream.fps.toFixed(1) : '—'}
+            {fps ? fps.toFixed(1) : '—'}
           </div>
         </div>
       </div>
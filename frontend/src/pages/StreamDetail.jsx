@@ -25,7 +25,9 @@ export default function StreamDetail() {
     if (isPaused) return
 
     const cleanup = wsLive(id, (data) => {
-      setLive(data)
+      // Stats and each image tier arrive as separate messages; merge them
+      setLive((prev) => ({ ...prev, ...data }))
+      if (data.type !== 'frame_stats') return
 
       // Update timeline
       setTimeline((prev) => {